@@ -10,14 +10,161 @@ class Settings(BaseSettings):
     DEMO_MODE: bool = True
     SSL_VERIFY: bool = True
 
+    # Authenticated-user cache (verified token -> user snapshot)
+    AUTH_CACHE_TTL: int = 60  # seconds; 0 disables
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
 
     # Database
     DATABASE_URL: str = "sqlite:///./chatbot.db"
 
+    # Group commit — chat writes from concurrent requests share a transaction (see services/group_commit.py)
+    WRITE_BATCHING_ENABLED: bool = True
+    WRITE_BATCH_SIZE: int = 64  # callers per transaction, at most
+    WRITE_BATCH_DELAY: float = 0.002  # seconds a batch waits to fill
+    WRITE_BATCH_QUEUE_SIZE: int = 1000  # beyond this, writers commit on their own
+
     # AI Models — UPDATE THESE FOR EACH COMPETITION
     DEFAULT_MODEL: str = "gpt-4o"
     SYSTEM_PROMPT: str = "You are a helpful AI assistant. Answer questions clearly and concisely."
-    MEMORY_WINDOW: int = 20
+    MEMORY_WINDOW: int = 100  # max history messages considered; the token budget usually binds first
+
+    # Context budget — history is packed newest-first into what's left of the
+    # model's context window after these reservations
+    CONTEXT_MEMORY_TOKENS: int = 1024  # reserved for long-term memories in the system prompt
+    CONTEXT_SAFETY_TOKENS: int = 256  # slack for tokenizer estimate error
+    COMPETITION_CONTEXT_WINDOW: int = 8192  # context size for models without a known window
+
+    # List endpoints — keyset pagination (see app/pagination.py)
+    SESSIONS_PAGE_SIZE: int = 50
+    MESSAGES_PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 500
+
+    # Background work (memory extraction, summaries) — drained on shutdown
+    BACKGROUND_WORKERS: int = 4
+    BACKGROUND_QUEUE_SIZE: int = 1000
+    BACKGROUND_DRAIN_TIMEOUT: float = 10.0  # seconds
+    MEMORY_BATCH_SIZE: int = 100  # extraction jobs upserted per transaction
+    MEMORY_BATCH_DELAY: float = 0.05  # seconds to wait for a batch to fill
+
+    # Long-term memory retrieval — memories ranked by relevance to the message
+    MEMORY_TOP_K: int = 10  # memories injected per turn
+    MEMORY_INDEX_MAX_USERS: int = 1000  # per-user indexes kept in memory (LRU)
+    MEMORY_INDEX_TTL: int = 300  # seconds before an index is rebuilt from the DB
+
+    # Images — chat image uploads (see services/image_store.py)
+    IMAGE_STORE_DIR: str = "./image_store"
+    MAX_IMAGE_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    IMAGE_MAX_PIXELS: int = 50_000_000  # uploads with more pixels are rejected (decompression bombs)
+    IMAGE_MAX_SIDE: int = 2048  # longest side sent to providers (OpenAI's high-detail limit)
+    IMAGE_MAX_SHORT_SIDE: int = 768  # shortest side, likewise
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_HISTORY_LIMIT: int = 2  # most recent images from the session sent with each turn
+
+    # Document uploads — text is extracted in a process pool
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    MAX_DOCUMENT_PAGES: int = 500
+    DOCUMENT_PAGES_PER_CHUNK: int = 16  # PDF pages extracted per pool task
+    DOCUMENT_WORKERS: int = 0  # extraction processes; 0 = one per CPU
+    DOCUMENT_CACHE_ENABLED: bool = True  # reuse extracted text for identical files
+    DOCUMENT_CACHE_DIR: str = "./document_cache"  # shared by all workers on the host
+    DOCUMENT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Documents attached to sessions — chunked, and only the best matches sent per turn
+    RAG_CHUNK_TOKENS: int = 300
+    RAG_CHUNK_OVERLAP_TOKENS: int = 50  # trailing text repeated at the start of the next chunk
+    RAG_TOP_K: int = 6  # chunks retrieved per turn
+    CONTEXT_DOCUMENT_TOKENS: int = 2048  # upper bound for retrieved chunks in the system prompt
+    RAG_INDEX_MAX_SESSIONS: int = 200  # per-session indexes kept in memory (LRU)
+    RAG_INDEX_TTL: int = 300  # seconds before an index is rebuilt from the DB
+
+    # Rolling summaries of messages that fell out of the context window
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_MODEL: str = "gpt-4o-mini"  # cheap model; skipped if it has no API key
+    SUMMARY_BATCH_MESSAGES: int = 50  # messages folded into the summary per model call
+    CONTEXT_SUMMARY_TOKENS: int = 512  # reserved for the summary in the system prompt
+
+    # Sampling defaults (a model entry in BASE_MODELS may override "temperature")
+    LLM_TEMPERATURE: float = 0.7
+    LLM_MAX_TOKENS: int = 4096
+
+    # Response cache — exact-match reuse of identical completions
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL: int = 3600  # seconds
+    RESPONSE_CACHE_MODEL_TTLS: dict[str, int] = {}  # JSON, e.g. {"gpt-4o": 600}; 0 disables a model
+    RESPONSE_CACHE_PATH: str = ""  # SQLite file for the persistent tier; empty = memory only
+    RESPONSE_CACHE_NONZERO_TEMPERATURE: bool = False  # also cache sampled (temperature > 0) replies
+
+    # Streaming — partial assistant replies are written to the DB this often (seconds)
+    STREAM_FLUSH_INTERVAL: float = 2.0
+
+    # Fan-out — one message answered by several models at once
+    FANOUT_MAX_MODELS: int = 4
+    FANOUT_MODEL_TIMEOUT: float = 60.0  # seconds per model; slower models are reported as timed out
+
+    # Resilience — failover, circuit breaking and hedging (see services/resilience.py)
+    MODEL_FALLBACKS: dict[str, list[str]] = {}  # JSON, e.g. {"gpt-4o": ["competition-model", "deepseek-chat"]}
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive failures before a provider is skipped
+    CIRCUIT_RESET_SECONDS: float = 30.0  # how long it is skipped before a trial request
+    HEDGE_ENABLED: bool = False
+    HEDGE_DEFAULT_DELAY: float = 2.0  # seconds, until enough latency samples exist
+    HEDGE_MIN_DELAY: float = 0.5  # floor for the p95-derived delay
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_LATENCY_WINDOW: int = 200  # recent requests kept per model for the p95
+
+    # Admission control — per-provider concurrency limits and retry (see services/admission.py)
+    PROVIDER_MAX_IN_FLIGHT: int = 32  # concurrent upstream calls per provider
+    PROVIDER_LIMITS: dict[str, int] = {}  # JSON, per-provider override, e.g. {"openai": 64}
+    PROVIDER_QUEUE_SIZE: int = 100  # calls waiting for a slot before new ones are shed
+    PROVIDER_QUEUE_TIMEOUT: float = 10.0  # seconds a call may wait for a slot
+    LLM_MAX_RETRIES: int = 3  # retries of 429/503 responses
+    LLM_RETRY_BASE_DELAY: float = 0.5  # seconds; backoff is jittered and doubles per retry
+    LLM_RETRY_MAX_DELAY: float = 20.0  # cap on backoff; a longer Retry-After fails over instead
+
+    # Per-user rate limits — token buckets on chat requests (see services/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_REQUESTS_PER_MINUTE: int = 20  # 0 = unlimited
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = 40000  # estimated message + reply tokens; 0 = unlimited
+    RATE_LIMIT_REPLY_TOKENS: int = 500  # charged per request for the reply, on top of the message
+    RATE_LIMITS: dict[str, dict[str, int]] = {}  # JSON, by model or provider, e.g. {"gpt-4o": {"requests_per_minute": 5}}
+    RATE_LIMIT_MAX_KEYS: int = 10000  # in-memory buckets kept (LRU)
+    RATE_LIMIT_PATH: str = ""  # SQLite file to share buckets across workers; empty = per process
+
+    # Request coalescing — identical concurrent requests share one upstream call
+    COALESCE_MODELS: list[str] = []  # JSON, e.g. ["gpt-4o-mini"]; ["*"] for every model
+
+    # Metrics — Prometheus text format at GET /metrics (see app/metrics.py)
+    METRICS_ENABLED: bool = True
+    STREAM_USAGE_PROVIDERS: list[str] = ["openai", "deepseek"]  # ask these for token usage on streamed replies
+
+    # Tracing — per-stage spans of sampled requests (see app/tracing.py)
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 0.01  # fraction of requests traced when the caller didn't decide
+    TRACE_FOLLOW_PARENT: bool = True  # honour the sampled flag of an incoming traceparent
+    TRACE_EXPORTER: str = "jsonl"  # "jsonl" or "otlp"
+    TRACE_FILE: str = "./traces/spans.jsonl"
+    TRACE_FILE_MAX_BYTES: int = 50 * 1024 * 1024
+    TRACE_FILE_BACKUPS: int = 3
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_OTLP_TIMEOUT: float = 5.0
+    TRACE_EXPORT_BATCH: int = 256
+    TRACE_EXPORT_DELAY: float = 1.0
+    TRACE_QUEUE_SIZE: int = 10000
+
+    # On-demand profiling — requests sending X-Profile: <token> (see app/profiling.py)
+    PROFILING_TOKEN: str = ""  # empty disables profiling entirely
+    PROFILING_DIR: str = "./profiles"
+    PROFILING_MAX_PER_MINUTE: int = 6
+    PROFILING_SAMPLE_INTERVAL: float = 0.005  # seconds between stack samples in "sample" mode
+
+    # Upstream HTTP connection pool (shared by all providers)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = False
+    HTTP_TIMEOUT: float = 120.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
 
     # OpenAI
     OPENAI_API_KEY: str = ""
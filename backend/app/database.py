@@ -1,29 +1,77 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from app import tracing
 from app.config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite specific
-    echo=False,
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _async_url(url: str) -> str:
+    """Map a plain DATABASE_URL onto its async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    return url
+
+
+engine = create_async_engine(_async_url(settings.DATABASE_URL), echo=False)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers proceed while a writer holds the lock; busy_timeout
+        # makes concurrent writers wait instead of failing with "database is locked".
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+if settings.TRACING_ENABLED:
+    # A span per statement (without parameters) inside sampled requests.
+    # The async driver runs these hooks in the caller's context.
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _trace_query_start(conn, cursor, statement, parameters, context, executemany):
+        context.trace_span = tracing.span("db.query", statement=statement)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _trace_query_end(conn, cursor, statement, parameters, context, executemany):
+        context.trace_span.end()
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _trace_query_error(exception_context):
+        trace_span = getattr(exception_context.execution_context, "trace_span", None)
+        if trace_span is not None:
+            trace_span.end(exception_context.original_exception)
+
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """FastAPI dependency: yields a DB session per request."""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
-    """Create all tables. Called on app startup."""
+async def run_in_session(fn, *args, **kwargs):
+    """
+    Run `fn(db, *args, **kwargs)` in its own short-lived session.
+
+    An AsyncSession cannot run two queries at once, so independent reads
+    that should run concurrently (asyncio.gather) each get their own.
+    """
+    async with SessionLocal() as db:
+        return await fn(db, *args, **kwargs)
+
+
+async def init_db():
+    """Create all tables and apply pending migrations. Called on app startup."""
     from app import models  # noqa: F401 — ensure models are imported
-    Base.metadata.create_all(bind=engine)
+    from app.migrations import apply_migrations
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(conn)
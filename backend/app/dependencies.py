@@ -1,8 +1,8 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.services.auth_service import verify_token
+from app.services.auth_service import verify_token, get_cached_user, cache_user, CurrentUser
 from app.models import User
 
 security = HTTPBearer()
@@ -10,10 +10,19 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
-    """Extract and validate JWT token, return the current user."""
+    db: AsyncSession = Depends(get_db),
+) -> CurrentUser:
+    """
+    Extract and validate JWT token, return the current user.
+
+    Verified tokens are cached (see auth_service), so repeat requests with
+    the same token skip both the JWT decode and the users query.
+    """
     token = credentials.credentials
+    cached = get_cached_user(token)
+    if cached is not None:
+        return cached
+
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(
@@ -21,10 +30,14 @@ async def get_current_user(
             detail="Invalid or expired token",
         )
 
-    user = db.query(User).filter(User.id == payload.get("sub")).first()
+    user_id = payload.get("sub")
+    user = await db.get(User, user_id) if user_id else None
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
-    return user
+
+    snapshot = CurrentUser.from_model(user)
+    cache_user(token, snapshot, payload.get("exp"))
+    return snapshot
@@ -1,18 +1,41 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
+from app import metrics, profiling, tracing
 from app.config import get_settings
 from app.database import init_db
 from app.routes import auth, chat, memory
+from app.services import (
+    admission,
+    background,
+    coalesce,
+    document_cache,
+    document_service,
+    group_commit,
+    model_router,
+    rate_limit,
+    resilience,
+    response_cache,
+)
 
 settings = get_settings()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database tables on startup."""
-    init_db()
+    """Initialize database tables, shared provider clients and background queues."""
+    await init_db()
+    await model_router.init_clients()
+    background.start_all()
     yield
+    # Drain queued work first — it may still need the DB and provider clients
+    await background.stop_all()
+    await model_router.close_clients()
+    await tracing.close_exporter()
+    response_cache.close_cache()
+    rate_limit.close_limiter()
+    document_service.close_executor()
 
 
 app = FastAPI(
@@ -29,8 +52,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Before-Cursor", "X-After-Cursor", "Retry-After", "traceparent"],  # pagination cursors, rate limits, tracing
 )
 
+# Profiling — inside tracing and metrics, so their bookkeeping stays out of profiles
+if settings.PROFILING_TOKEN:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Tracing — root span per sampled request
+if settings.TRACING_ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+
+# Metrics — added last so it is outermost and times everything, CORS included
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Register routes
 app.include_router(auth.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
@@ -50,3 +86,25 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+
+@app.get("/stats")
+async def stats():
+    """Runtime counters for caches and other in-process components."""
+    return {
+        "response_cache": response_cache.stats(),
+        "background": background.stats(),
+        "document_cache": document_cache.stats(),
+        "resilience": resilience.stats(),
+        "admission": admission.stats(),
+        "coalescing": coalesce.stats(),
+        "rate_limit": rate_limit.stats(),
+        "group_commit": group_commit.stats(),
+    }
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
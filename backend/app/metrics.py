@@ -0,0 +1,374 @@
+"""
+Metrics — In-process Prometheus metrics, served at GET /metrics.
+
+A small registry of counters, gauges and histograms rendered in the
+Prometheus text format (0.0.4), without a client library:
+- Recording is a dict lookup for the label set plus a few adds (and a
+  bisect for histograms), so it is cheap enough for every request
+- Values other components already keep (cache hit counters, admission
+  queues, background queues) are read only at scrape time, via
+  collectors, and cost nothing in between
+
+MetricsMiddleware is a pure ASGI middleware timing every HTTP request per
+route template (/api/chat/sessions/{session_id}/messages, not the raw
+path) and tracking requests in flight. For streaming responses the
+duration covers the whole stream.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Iterable
+
+# Seconds; spans fast DB calls to slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = tuple[str, dict[str, str], float]  # (metric name, labels, value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for one label set; create it once and keep it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A new child holding one label set's value."""
+
+    @abstractmethod
+    def samples(self) -> Iterable[Sample]:
+        """Every child's samples, as rendered."""
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}_total", dict(zip(self.labelnames, values)), child.value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield self.name, dict(zip(self.labelnames, values)), child.value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self._children.items():
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[tuple[str, str, str, Callable[[], Iterable[tuple[dict[str, str], float]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, type: str, documentation: str):
+        """
+        Decorator for a function called at scrape time that returns
+        [(labels, value), ...] for metric `name`, for values kept elsewhere.
+        """
+        def decorator(fn):
+            self._collectors.append((name, type, documentation, fn))
+            return fn
+        return decorator
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            family = _family_name(metric.name, metric.type)
+            lines.append(f"# HELP {family} {metric.documentation}")
+            lines.append(f"# TYPE {family} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, type, documentation, fn in self._collectors:
+            family = _family_name(name, type)
+            lines.append(f"# HELP {family} {documentation}")
+            lines.append(f"# TYPE {family} {type}")
+            for labels, value in fn():
+                lines.append(f"{family}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _family_name(name: str, type: str) -> str:
+    """The name HELP/TYPE go under: in format 0.0.4 it must match the samples', so a counter's has _total."""
+    return f"{name}_total" if type == "counter" else name
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ── HTTP ──
+
+http_requests = counter("http_requests", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_duration = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+http_in_flight = gauge("http_requests_in_flight", "HTTP requests being handled")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request count, latency and in-flight gauge per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        in_flight = http_in_flight.labels()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            # The router has put the matched route into the scope by now;
+            # unmatched paths share one label so scanners can't explode cardinality
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, template).observe(elapsed)
+            http_requests.labels(method, template, str(status)).inc()
+
+
+# ── DB ──
+
+db_function_duration = histogram(
+    "db_function_duration_seconds", "Time spent in DB-backed service functions", ("function",)
+)
+
+
+def timed_db(fn):
+    """Record the duration of an async DB-backed service function under its module.name."""
+    histogram_child = db_function_duration.labels(f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}")
+
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            histogram_child.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+# ── LLM ──
+
+llm_requests = counter("llm_requests", "Upstream LLM requests by outcome", ("provider", "model", "outcome"))
+llm_request_duration = histogram(
+    "llm_request_duration_seconds",
+    "Upstream LLM request latency (whole response; streams until the last chunk)",
+    ("provider", "model", "mode"),
+)
+llm_time_to_first_token = histogram(
+    "llm_time_to_first_token_seconds", "Time to the first streamed content chunk", ("provider", "model")
+)
+llm_tokens = counter("llm_tokens", "Tokens reported by providers in response.usage", ("provider", "model", "type"))
+
+
+def record_usage(provider: str, model: str, usage):
+    """Count prompt/completion tokens from an OpenAI-style usage object, if the provider sent one."""
+    if usage is None:
+        return
+    llm_tokens.labels(provider, model, "prompt").inc(usage.prompt_tokens or 0)
+    llm_tokens.labels(provider, model, "completion").inc(usage.completion_tokens or 0)
+
+
+# ── Scrape-time collectors for state kept by other components ──
+# (imported lazily: those modules import this one)
+
+@REGISTRY.collector("cache_hits", "counter", "Cache hits per cache")
+def _cache_hits():
+    return [({"cache": name}, stats["hits"]) for name, stats in _cache_stats() if "hits" in stats]
+
+
+@REGISTRY.collector("cache_misses", "counter", "Cache misses per cache")
+def _cache_misses():
+    return [({"cache": name}, stats["misses"]) for name, stats in _cache_stats() if "misses" in stats]
+
+
+@REGISTRY.collector("cache_hit_ratio", "gauge", "Hit ratio per cache since start")
+def _cache_hit_ratio():
+    return [({"cache": name}, stats["hit_ratio"]) for name, stats in _cache_stats() if "hit_ratio" in stats]
+
+
+def _cache_stats():
+    from app.services import coalesce, document_cache, response_cache
+
+    coalescing = coalesce.stats()
+    requests = coalescing["leaders"] + coalescing["coalesced"]
+    return [
+        ("response", response_cache.stats()),
+        ("document", document_cache.stats()),
+        ("coalescing", {
+            "hits": coalescing["coalesced"],
+            "misses": coalescing["leaders"],
+            "hit_ratio": round(coalescing["coalesced"] / requests, 4) if requests else 0.0,
+        }),
+    ]
+
+
+@REGISTRY.collector("llm_requests_in_flight", "gauge", "Upstream LLM calls holding an admission slot")
+def _llm_in_flight():
+    from app.services import admission
+
+    return [({"provider": provider}, stats["in_flight"]) for provider, stats in admission.stats().items()]
+
+
+@REGISTRY.collector("llm_requests_queued", "gauge", "Upstream LLM calls waiting for an admission slot")
+def _llm_queued():
+    from app.services import admission
+
+    return [({"provider": provider}, stats["queue_depth"]) for provider, stats in admission.stats().items()]
+
+
+@REGISTRY.collector("llm_requests_shed", "counter", "Upstream LLM calls rejected by admission control")
+def _llm_shed():
+    from app.services import admission
+
+    return [
+        ({"provider": provider}, stats["shed"] + stats["timeouts"]) for provider, stats in admission.stats().items()
+    ]
+
+
+@REGISTRY.collector("circuit_open", "gauge", "1 while a provider's circuit breaker is open")
+def _circuit_open():
+    from app.services import resilience
+
+    return [
+        ({"provider": provider}, 1 if stats["state"] == "open" else 0)
+        for provider, stats in resilience.stats()["breakers"].items()
+    ]
+
+
+@REGISTRY.collector("background_jobs_queued", "gauge", "Jobs waiting in background queues")
+def _background_queued():
+    from app.services import background
+
+    return [({"queue": name}, stats["queued"]) for name, stats in background.stats().items()]
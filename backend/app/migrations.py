@@ -0,0 +1,106 @@
+"""
+Schema Migrations — Versioned changes for existing databases.
+
+init_db() runs create_all, which only creates tables that are missing; it
+never changes a table that already exists. Everything else (new indexes,
+new columns) goes here as a numbered migration. Applied versions are
+recorded in the schema_version table, so each migration runs exactly once
+per database, in order.
+
+To change the schema:
+1. Update the model in models.py (fresh databases get it from create_all)
+2. Append a migration below that brings old databases in line
+Keep steps idempotent — on a fresh database create_all has usually
+already done the work. Use IF NOT EXISTS for indexes and add_column()
+for new columns.
+"""
+
+from datetime import datetime
+from typing import Awaitable, Callable, Union
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# A step is either a SQL string or an async callable taking the connection
+Step = Union[str, Callable[[AsyncConnection], Awaitable[None]]]
+
+
+def add_column(table: str, column: str, ddl: str) -> Step:
+    """Step that runs ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    async def step(conn: AsyncConnection):
+        existing = await conn.run_sync(
+            lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(table)}
+        )
+        if column not in existing:
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+# (version, description, steps)
+MIGRATIONS: list[tuple[int, str, list[Step]]] = [
+    (1, "composite indexes for hot query paths", [
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_id_created_at "
+        "ON messages (session_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_id_updated_at "
+        "ON chat_sessions (user_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_memory_store_user_id_key "
+        "ON memory_store (user_id, key)",
+    ]),
+    (2, "rolling conversation summary on chat sessions", [
+        add_column("chat_sessions", "summary", "TEXT"),
+        add_column("chat_sessions", "summarized_until", "TIMESTAMP"),
+    ]),
+    (3, "extend list indexes with id for keyset pagination", [
+        "CREATE INDEX IF NOT EXISTS ix_messages_session_id_created_at_id "
+        "ON messages (session_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_id_updated_at_id "
+        "ON chat_sessions (user_id, updated_at, id)",
+        # Prefixes of the new indexes, so redundant
+        "DROP INDEX IF EXISTS ix_messages_session_id_created_at",
+        "DROP INDEX IF EXISTS ix_chat_sessions_user_id_updated_at",
+    ]),
+    (4, "reply model and parent message, for fan-out siblings", [
+        add_column("messages", "model", "VARCHAR"),
+        add_column("messages", "parent_id", "VARCHAR REFERENCES messages(id)"),
+    ]),
+    (5, "summary position by (created_at, id)", [
+        add_column("chat_sessions", "summarized_until_id", "VARCHAR"),
+        # Summaries so far covered every message at summarized_until
+        "UPDATE chat_sessions SET summarized_until_id = ("
+        "SELECT MAX(m.id) FROM messages m "
+        "WHERE m.session_id = chat_sessions.id AND m.created_at = chat_sessions.summarized_until) "
+        "WHERE summarized_until IS NOT NULL AND summarized_until_id IS NULL",
+    ]),
+]
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    """Return the highest applied migration version (0 for a new database)."""
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+    result = await conn.execute(text("SELECT MAX(version) FROM schema_version"))
+    return result.scalar() or 0
+
+
+async def apply_migrations(conn: AsyncConnection) -> list[int]:
+    """Apply every pending migration in order. Returns the versions applied."""
+    current = await get_schema_version(conn)
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        for step in steps:
+            if isinstance(step, str):
+                await conn.execute(text(step))
+            else:
+                await step(conn)
+        await conn.execute(
+            text("INSERT INTO schema_version (version, description, applied_at) "
+                 "VALUES (:version, :description, :applied_at)"),
+            {"version": version, "description": description, "applied_at": datetime.utcnow()},
+        )
+        applied.append(version)
+    return applied
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -26,11 +26,19 @@ class ChatSession(Base):
     title = Column(String, default="New Chat")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    summary = Column(Text, nullable=True)  # rolling summary of messages older than the context window
+    summarized_until = Column(DateTime, nullable=True)  # created_at of the last message in the summary
+    summarized_until_id = Column(String, nullable=True)  # and its id, for messages sharing that created_at
 
     user = relationship("User", back_populates="sessions")
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan",
                             order_by="Message.created_at")
 
+    __table_args__ = (
+        # Session list: WHERE user_id = ? [AND (updated_at, id) < cursor] ORDER BY updated_at DESC, id DESC
+        Index("ix_chat_sessions_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -40,10 +48,18 @@ class Message(Base):
     role = Column(String, nullable=False)  # "user" | "assistant" | "system"
     content = Column(Text, nullable=False)
     image_url = Column(String, nullable=True)  # path to uploaded image
+    model = Column(String, nullable=True)  # assistant replies: the model that wrote it
+    parent_id = Column(String, ForeignKey("messages.id"), nullable=True)  # assistant replies: the user message answered
     created_at = Column(DateTime, default=datetime.utcnow)
 
     session = relationship("ChatSession", back_populates="messages")
 
+    __table_args__ = (
+        # History pages and context window: WHERE session_id = ? [AND (created_at, id) < cursor]
+        # ORDER BY created_at, id
+        Index("ix_messages_session_id_created_at_id", "session_id", "created_at", "id"),
+    )
+
 
 class MemoryStore(Base):
     __tablename__ = "memory_store"
@@ -56,3 +72,36 @@ class MemoryStore(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="memories")
+
+    __table_args__ = (
+        # Memory upsert: WHERE user_id = ? AND key = ?
+        Index("ix_memory_store_user_id_key", "user_id", "key"),
+    )
+
+
+class Document(Base):
+    """A file attached to a chat session; its text lives in DocumentChunk rows."""
+    __tablename__ = "documents"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    session_id = Column(String, ForeignKey("chat_sessions.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    sha256 = Column(String, nullable=False)  # of the uploaded bytes
+    size = Column(Integer, nullable=False)  # upload size in bytes
+    chunk_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    document_id = Column(String, ForeignKey("documents.id"), nullable=False, index=True)
+    session_id = Column(String, ForeignKey("chat_sessions.id"), nullable=False)  # denormalized for index builds
+    position = Column(Integer, nullable=False)  # order within the document
+    content = Column(Text, nullable=False)
+
+    __table_args__ = (
+        # Retrieval index build: WHERE session_id = ?
+        Index("ix_document_chunks_session_id", "session_id"),
+    )
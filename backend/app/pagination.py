@@ -0,0 +1,115 @@
+"""
+Pagination — Keyset (cursor) pagination for lists ordered by (timestamp, id).
+
+A cursor is the opaque, URL-safe encoding of one row's (timestamp, id).
+Pages are fetched with a row-value comparison against it, e.g.
+WHERE (created_at, id) < (:ts, :id) ORDER BY created_at DESC, id DESC,
+which the composite (parent, timestamp, id) indexes answer directly, so
+page N costs the same as page 1 (no OFFSET scans).
+
+List endpoints return the page as a plain JSON list and put the cursors in
+response headers:
+- X-Before-Cursor: pass as `before` to get the page of older rows
+- X-After-Cursor: pass as `after` to get the page of newer rows
+A header is only sent when rows exist in that direction (for `after`, when
+the request itself came from a newer page or asked for newer rows).
+"""
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+
+
+@dataclass(frozen=True, slots=True, order=True)
+class Cursor:
+    """One row's position; compares in (timestamp, id) order, like the queries."""
+
+    timestamp: datetime
+    id: str
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str | None) -> Cursor | None:
+    """Parse a cursor from a query parameter; a malformed one is a 400."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("utf-8")
+        timestamp, row_id = raw.split("|", 1)
+        return Cursor(datetime.fromisoformat(timestamp), row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@dataclass(slots=True)
+class Page:
+    items: list
+    before: str | None = None  # cursor for the older neighbouring page
+    after: str | None = None   # cursor for the newer neighbouring page
+
+    def headers(self) -> dict[str, str]:
+        headers = {}
+        if self.before:
+            headers["X-Before-Cursor"] = self.before
+        if self.after:
+            headers["X-After-Cursor"] = self.after
+        return headers
+
+
+async def keyset_page(
+    db,
+    query: Select,
+    timestamp_col,
+    id_col,
+    limit: int,
+    before: Cursor | None = None,
+    after: Cursor | None = None,
+    newest_first: bool = False,
+) -> Page:
+    """
+    Fetch one page of `query` (ORM entities) by (timestamp_col, id_col).
+
+    Without cursors the newest `limit` rows are returned. Items come back
+    oldest first, or newest first with newest_first=True.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    key = tuple_(timestamp_col, id_col)
+
+    if after is not None:
+        # Walk forward (ascending) from the cursor
+        query = query.where(key > tuple_(after.timestamp, after.id)).order_by(timestamp_col.asc(), id_col.asc())
+    else:
+        if before is not None:
+            query = query.where(key < tuple_(before.timestamp, before.id))
+        query = query.order_by(timestamp_col.desc(), id_col.desc())
+
+    rows = list(await db.scalars(query.limit(limit + 1)))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()  # fetched newest first; normalize to oldest first
+
+    page = Page(items=rows)
+    if rows:
+        oldest = encode_cursor(getattr(rows[0], timestamp_col.key), getattr(rows[0], id_col.key))
+        newest = encode_cursor(getattr(rows[-1], timestamp_col.key), getattr(rows[-1], id_col.key))
+    else:
+        # Empty page: the way back is the cursor the request came from
+        came_from = before or after
+        oldest = newest = encode_cursor(came_from.timestamp, came_from.id) if came_from else None
+    if after is None:
+        page.before = oldest if has_more else None
+        page.after = newest if before is not None else None
+    else:
+        page.before = oldest
+        page.after = newest if has_more else None
+    if newest_first:
+        page.items.reverse()
+    return page
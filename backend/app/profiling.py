@@ -0,0 +1,170 @@
+"""
+Profiling — On-demand profiles of single production requests.
+
+A request carrying `X-Profile: <PROFILING_TOKEN>` runs under a profiler
+and the result is written to PROFILING_DIR; the response's X-Profile
+header names the file. `X-Profile-Mode` picks the profiler:
+- "cprofile" (default): deterministic; a pstats dump (.prof) for
+  snakeviz or `python -m pstats`
+- "sample": the event loop thread's stack every PROFILING_SAMPLE_INTERVAL
+  seconds, as collapsed stacks (.collapsed) for flamegraph.pl/speedscope
+
+Both watch the event loop thread for the whole request (including a
+streamed body), so anything else it runs meanwhile shows up too; work
+sent to threads or the process pool does not.
+
+Only one request is profiled at a time, at most PROFILING_MAX_PER_MINUTE
+per process; a trigger over that runs unprofiled (X-Profile: skipped).
+Without PROFILING_TOKEN the middleware is not installed at all.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_recent: deque[float] = deque()  # start times of profiles in the last minute
+_active = False
+
+
+class _Sampler:
+    """Samples one thread's stack from a helper thread into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _triggered(headers: list[tuple[bytes, bytes]]) -> tuple[bool, str]:
+    """(whether the request asks for a valid profile, mode)."""
+    token, mode = None, "cprofile"
+    for key, value in headers:
+        if key == b"x-profile":
+            token = value
+        elif key == b"x-profile-mode":
+            mode = value.decode("latin-1").strip().lower()
+    if token is None:
+        return False, mode
+    return hmac.compare_digest(token, settings.PROFILING_TOKEN.encode()), mode
+
+
+def _acquire() -> bool:
+    """Take the single profiling slot if the per-minute budget allows."""
+    global _active
+    now = time.monotonic()
+    while _recent and now - _recent[0] > 60:
+        _recent.popleft()
+    if _active or len(_recent) >= settings.PROFILING_MAX_PER_MINUTE:
+        return False
+    _active = True
+    _recent.append(now)
+    return True
+
+
+def _release():
+    global _active
+    _active = False
+
+
+def _file_name(scope, extension: str) -> str:
+    """<time>-<pid>-<method>-<route template>.<extension>; the raw path if no route matched."""
+    path = getattr(scope.get("route"), "path", None) or scope["path"]
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:80] or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{scope['method'].lower()}-{slug}.{extension}"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: profile requests that present the profiling token."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        triggered, mode = _triggered(scope["headers"])
+        if not triggered:
+            await self.app(scope, receive, send)
+            return
+        if mode not in ("cprofile", "sample") or not _acquire():
+            await self.app(scope, receive, self._with_header(send, lambda: "skipped"))
+            return
+
+        extension = "prof" if mode == "cprofile" else "collapsed"
+        names = []
+
+        def name() -> str:
+            # Named once the router has matched (at the response start, or after an error)
+            if not names:
+                names.append(_file_name(scope, extension))
+            return names[0]
+
+        try:
+            if mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, self._with_header(send, name))
+                finally:
+                    profiler.disable()
+                write = profiler.dump_stats
+            else:
+                sampler = _Sampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, self._with_header(send, name))
+                finally:
+                    sampler.stop()
+                write = sampler.write
+        finally:
+            _release()
+
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        await asyncio.to_thread(write, os.path.join(settings.PROFILING_DIR, name()))
+        logger.info("Profiled %s %s -> %s", scope["method"], scope["path"], name())
+
+    @staticmethod
+    def _with_header(send, value: Callable[[], str]):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile", value().encode())]}
+            await send(message)
+        return send_wrapper
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.config import get_settings
 from app.schemas import TokenResponse, UserResponse, DemoLoginRequest
@@ -10,9 +10,9 @@ from app.services.auth_service import (
     get_microsoft_user_info,
     get_or_create_user,
     create_access_token,
+    CurrentUser,
 )
 from app.dependencies import get_current_user
-from app.models import User
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 settings = get_settings()
@@ -28,7 +28,7 @@ async def login():
 
 
 @router.get("/callback")
-async def auth_callback(code: str = Query(...), db: Session = Depends(get_db)):
+async def auth_callback(code: str = Query(...), db: AsyncSession = Depends(get_db)):
     """Handle Microsoft OAuth2 callback."""
     try:
         # Exchange code for Microsoft access token
@@ -41,7 +41,7 @@ async def auth_callback(code: str = Query(...), db: Session = Depends(get_db)):
         display_name = user_info.get("displayName", email)
 
         # Create or get user in our DB
-        user = get_or_create_user(db, email, display_name, provider="microsoft")
+        user = await get_or_create_user(db, email, display_name, provider="microsoft")
 
         # Create our JWT token
         jwt_token = create_access_token(user.id, user.email)
@@ -55,12 +55,12 @@ async def auth_callback(code: str = Query(...), db: Session = Depends(get_db)):
 
 
 @router.post("/demo-login", response_model=TokenResponse)
-async def demo_login(body: DemoLoginRequest, db: Session = Depends(get_db)):
+async def demo_login(body: DemoLoginRequest, db: AsyncSession = Depends(get_db)):
     """Demo login for development/testing. Only works when DEMO_MODE=true."""
     if not settings.DEMO_MODE:
         raise HTTPException(status_code=403, detail="Demo mode is disabled")
 
-    user = get_or_create_user(db, body.email, body.display_name, provider="demo")
+    user = await get_or_create_user(db, body.email, body.display_name, provider="demo")
     token = create_access_token(user.id, user.email)
 
     return TokenResponse(
@@ -70,6 +70,6 @@ async def demo_login(body: DemoLoginRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Get current authenticated user info."""
     return UserResponse.model_validate(current_user)
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.database import get_db, SessionLocal
 from app.dependencies import get_current_user
-from app.models import User
+from app.services.auth_service import CurrentUser
 from app.schemas import (
     ChatSessionCreate,
     ChatSessionResponse,
@@ -10,11 +13,17 @@ from app.schemas import (
     MessageResponse,
     ChatResponse,
     DocumentResponse,
+    FanoutCreate,
+    ImageResponse,
+    SessionDocumentResponse,
 )
-from app.services import chat_service, document_service
-from app.services.model_router import get_available_models
-import io
+from app.services import chat_service, document_service, image_store, rag_service, rate_limit
+from app.services.model_router import get_available_models, get_full_registry
+from app.pagination import Page, decode_cursor
+import json
+import os
 
+settings = get_settings()
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
@@ -27,32 +36,41 @@ async def list_models():
 @router.post("/sessions", response_model=ChatSessionResponse)
 async def create_session(
     body: ChatSessionCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """Create a new chat session."""
-    session = chat_service.create_session(db, current_user.id, body.title)
+    session = await chat_service.create_session(db, current_user.id, body.title)
     return ChatSessionResponse.model_validate(session)
 
 
 @router.get("/sessions", response_model=list[ChatSessionResponse])
 async def list_sessions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    limit: int = Query(settings.SESSIONS_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    before: str | None = None,
+    after: str | None = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    """List all chat sessions for the current user."""
-    sessions = chat_service.get_user_sessions(db, current_user.id)
-    return [ChatSessionResponse.model_validate(s) for s in sessions]
+    """
+    List the current user's chat sessions, most recently updated first, one
+    page at a time. Cursors for neighbouring pages are returned in the
+    X-Before-Cursor / X-After-Cursor headers (see app.pagination).
+    """
+    page = await chat_service.get_user_sessions(
+        db, current_user.id, limit, decode_cursor(before), decode_cursor(after)
+    )
+    return _page_response(_sessions_adapter, page)
 
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete a chat session."""
-    deleted = chat_service.delete_session(db, session_id, current_user.id)
+    deleted = await chat_service.delete_session(db, session_id, current_user.id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"message": "Session deleted"}
@@ -61,36 +79,56 @@ async def delete_session(
 @router.get("/sessions/{session_id}/messages", response_model=list[MessageResponse])
 async def get_messages(
     session_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    limit: int = Query(settings.MESSAGES_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    before: str | None = None,
+    after: str | None = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Get all messages in a chat session."""
-    session = chat_service.get_session(db, session_id, current_user.id)
+    """
+    Get a page of messages in a chat session, oldest first. Without a
+    cursor this is the latest page; X-Before-Cursor leads to older messages.
+    """
+    session = await chat_service.get_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    messages = chat_service.get_session_messages(db, session_id)
-    return [MessageResponse.model_validate(m) for m in messages]
+    page = await chat_service.get_session_messages(
+        db, session_id, limit, decode_cursor(before), decode_cursor(after)
+    )
+    return _page_response(_messages_adapter, page)
+
+
+# Whole pages are validated and serialized in one pass by pydantic-core,
+# rather than one model_validate per row and a second pass by FastAPI
+_sessions_adapter = TypeAdapter(list[ChatSessionResponse])
+_messages_adapter = TypeAdapter(list[MessageResponse])
+
+
+def _page_response(adapter: TypeAdapter, page: Page) -> Response:
+    items = adapter.validate_python(page.items, from_attributes=True)
+    return Response(content=adapter.dump_json(items), media_type="application/json", headers=page.headers())
 
 
 @router.post("/sessions/{session_id}/messages", response_model=ChatResponse)
 async def send_message(
     session_id: str,
     body: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """Send a message and get an AI response."""
-    session = chat_service.get_session(db, session_id, current_user.id)
+    session = await chat_service.get_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    await _check_rate_limit(current_user.id, [body.model], body.content)
+    image_id = await _resolve_image(body.image_id, body.image_base64)
 
     user_msg, assistant_msg = await chat_service.send_message(
-        db=db,
         session_id=session_id,
         user_id=current_user.id,
         content=body.content,
         model_name=body.model,
-        image_base64=body.image_base64,
+        image_id=image_id,
     )
 
     return ChatResponse(
@@ -99,16 +137,319 @@ async def send_message(
     )
 
 
+async def _check_rate_limit(user_id: str, model_names: list[str | None], content: str):
+    try:
+        await rate_limit.check(user_id, model_names, content)
+    except rate_limit.RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=e.headers())
+
+
+async def _resolve_image(image_id: str | None, image_base64: str | None = None) -> str | None:
+    """The image_store id of the message's image, storing an inline base64 image first."""
+    if image_id:
+        if image_store.path_for(image_id) is None:
+            raise HTTPException(status_code=400, detail="Unknown image_id")
+        return image_id
+    if image_base64:
+        try:
+            return (await image_store.save_base64(image_base64)).id
+        except image_store.ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return None
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/sessions/{session_id}/messages/stream")
+async def stream_message(
+    session_id: str,
+    body: MessageCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Send a message and stream the AI response as Server-Sent Events.
+
+    Events: `user_message` (saved user message), `delta` ({"content": ...}
+    for each chunk), `assistant_message` (final saved reply).
+    """
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    await _check_rate_limit(current_user.id, [body.model], body.content)
+    image_id = await _resolve_image(body.image_id, body.image_base64)
+
+    user_id = current_user.id
+
+    async def event_stream():
+        async for kind, payload in chat_service.stream_message(
+            session_id=session_id,
+            user_id=user_id,
+            content=body.content,
+            model_name=body.model,
+            image_id=image_id,
+        ):
+            if kind == "delta":
+                yield _sse("delta", {"content": payload})
+            else:
+                yield _sse(kind, MessageResponse.model_validate(payload).model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/sessions/{session_id}/messages/fanout")
+async def fan_out_message(
+    session_id: str,
+    body: FanoutCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Send one message to several models at once and stream their replies
+    as Server-Sent Events, in the order they finish.
+
+    Events: `user_message` (saved user message), then per model either
+    `assistant_message` (its saved reply; siblings share parent_id) or
+    `model_error` ({"model": ..., "error": ...}), then `done`.
+    """
+    models = list(dict.fromkeys(body.models))
+    if not models:
+        raise HTTPException(status_code=400, detail="models must not be empty")
+    if len(models) > settings.FANOUT_MAX_MODELS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.FANOUT_MAX_MODELS} models per message")
+    unknown = [name for name in models if name not in get_full_registry()]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models: {', '.join(unknown)}")
+    if body.timeout is not None and body.timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    # Each model's reply is charged to its own limit, all or none
+    await _check_rate_limit(current_user.id, models, body.content)
+    image_id = await _resolve_image(body.image_id)
+
+    user_id = current_user.id
+
+    async def event_stream():
+        async for kind, payload in chat_service.fan_out_message(
+            session_id=session_id,
+            user_id=user_id,
+            content=body.content,
+            model_names=models,
+            image_id=image_id,
+            timeout=body.timeout,
+        ):
+            if kind == "model_error":
+                yield _sse(kind, payload)
+            else:
+                yield _sse(kind, MessageResponse.model_validate(payload).model_dump(mode="json"))
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/images", response_model=ImageResponse)
+async def upload_image(
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Upload an image for a chat message (multipart). It is downscaled and
+    re-encoded for the models; send the returned id as `image_id`.
+    """
+    try:
+        image = await image_store.save_upload(file)
+    except image_store.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ImageResponse(id=image.id, url=image.url, width=image.width, height=image.height, size=image.size)
+
+
+@router.get("/images/{image_id}")
+async def get_image(image_id: str):
+    """
+    Serve a stored image. Unauthenticated so it works as an <img> src: the
+    id is the SHA-256 of the image, so only someone who has it can ask.
+    """
+    path = image_store.path_for(image_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(
+        path,
+        media_type=image_store.MIME_TYPES[image_id.rsplit(".", 1)[1]],
+        # Content-addressed, so it never changes
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
 @router.post("/upload-document", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     """Upload a document and extract its text."""
+    upload = await _save_upload(file)
+    try:
+        extracted_text = await document_service.extract_text(upload)
+    except document_service.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to process document: {str(e)}")
+    finally:
+        os.unlink(upload.path)
+    return DocumentResponse(filename=file.filename, content=extracted_text)
+
+
+@router.post("/upload-document/stream")
+async def upload_document_stream(
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Upload a document and stream extraction progress as Server-Sent Events.
+
+    Events: `progress` ({"pages_done", "pages_total"}, PDFs only),
+    `document` (DocumentResponse), or `error` ({"detail": ...}).
+    """
+    upload = await _save_upload(file)
+
+    async def event_stream():
+        try:
+            async for kind, payload in document_service.iter_extraction(upload):
+                if kind == "progress":
+                    yield _sse("progress", payload)
+                else:
+                    yield _sse("document", DocumentResponse(filename=upload.filename, content=payload).model_dump())
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to process document: {str(e)}"})
+        finally:
+            os.unlink(upload.path)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/sessions/{session_id}/documents", response_model=list[SessionDocumentResponse])
+async def list_documents(
+    session_id: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List the documents attached to a chat session."""
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    documents = await rag_service.list_documents(db, session_id)
+    return [SessionDocumentResponse.model_validate(d) for d in documents]
+
+
+@router.post("/sessions/{session_id}/documents", response_model=SessionDocumentResponse)
+async def attach_document(
+    session_id: str,
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Attach a document to a chat session. Its text stays on the server;
+    relevant excerpts are added to the model context on each turn.
+    """
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    upload = await _save_upload(file)
     try:
-        content = await file.read()
-        extracted_text = document_service.extract_text_from_file(io.BytesIO(content), file.filename)
-        return DocumentResponse(filename=file.filename, content=extracted_text)
+        async for kind, payload in rag_service.attach_document(db, session_id, upload):
+            if kind == "document":
+                document = payload
+    except document_service.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to process document: {str(e)}")
+    finally:
+        os.unlink(upload.path)
+    return SessionDocumentResponse.model_validate(document)
+
+
+@router.post("/sessions/{session_id}/documents/stream")
+async def attach_document_stream(
+    session_id: str,
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Attach a document to a chat session, streaming progress as Server-Sent
+    Events: `progress` ({"pages_done", "pages_total"}, PDFs only),
+    `document` (SessionDocumentResponse), or `error` ({"detail": ...}).
+    """
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    upload = await _save_upload(file)
+
+    async def event_stream():
+        try:
+            async with SessionLocal() as stream_db:
+                async for kind, payload in rag_service.attach_document(stream_db, session_id, upload):
+                    if kind == "progress":
+                        yield _sse("progress", payload)
+                    else:
+                        yield _sse("document", SessionDocumentResponse.model_validate(payload).model_dump(mode="json"))
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to process document: {str(e)}"})
+        finally:
+            os.unlink(upload.path)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.delete("/sessions/{session_id}/documents/{document_id}")
+async def delete_document(
+    session_id: str,
+    document_id: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Remove a document from a chat session."""
+    session = await chat_service.get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    deleted = await rag_service.delete_document(db, session_id, document_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"message": "Document deleted"}
+
+
+async def _save_upload(file: UploadFile) -> document_service.SavedUpload:
+    """Spool an upload to disk, mapping size/type errors to HTTP errors."""
+    try:
+        return await document_service.save_upload(file)
+    except document_service.DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to process document: {str(e)}")
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models import User, MemoryStore
+from app.services.auth_service import CurrentUser
 from app.schemas import MemoryCreate, MemoryResponse, MemoryListResponse
 from app.services import memory_service
 
@@ -11,17 +11,11 @@ router = APIRouter(prefix="/memory", tags=["Memory"])
 
 @router.get("/", response_model=MemoryListResponse)
 async def list_memories(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """List all long-term memories for the current user."""
-    memories = memory_service.get_long_term_memory(db, current_user.id)
-    items = (
-        db.query(MemoryStore)
-        .filter(MemoryStore.user_id == current_user.id)
-        .order_by(MemoryStore.created_at.desc())
-        .all()
-    )
+    items = await memory_service.list_memories(db, current_user.id)
     return MemoryListResponse(
         memories=[MemoryResponse.model_validate(m) for m in items]
     )
@@ -30,11 +24,11 @@ async def list_memories(
 @router.post("/", response_model=MemoryResponse)
 async def create_memory(
     body: MemoryCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """Manually add a memory."""
-    memory = memory_service.save_memory(
+    memory = await memory_service.save_memory(
         db, current_user.id, body.key, body.value, body.category
     )
     return MemoryResponse.model_validate(memory)
@@ -42,9 +36,9 @@ async def create_memory(
 
 @router.delete("/")
 async def clear_memories(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete all memories for the current user."""
-    memory_service.delete_user_memories(db, current_user.id)
+    await memory_service.delete_user_memories(db, current_user.id)
     return {"message": "All memories cleared"}
@@ -51,7 +51,8 @@ class ChatSessionResponse(BaseModel):
 class MessageCreate(BaseModel):
     content: str
     model: Optional[str] = None  # if None, uses DEFAULT_MODEL
-    image_base64: Optional[str] = None  # base64-encoded image
+    image_id: Optional[str] = None  # from POST /chat/images
+    image_base64: Optional[str] = None  # base64-encoded image (older clients; prefer image_id)
 
 
 class MessageResponse(BaseModel):
@@ -60,22 +61,51 @@ class MessageResponse(BaseModel):
     role: str
     content: str
     image_url: Optional[str] = None
+    model: Optional[str] = None
+    parent_id: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class FanoutCreate(BaseModel):
+    content: str
+    models: List[str]  # model names from GET /chat/models
+    image_id: Optional[str] = None  # from POST /chat/images
+    timeout: Optional[float] = None  # seconds per model; capped at FANOUT_MODEL_TIMEOUT
+
+
 class ChatResponse(BaseModel):
     user_message: MessageResponse
     assistant_message: MessageResponse
 
 
+class ImageResponse(BaseModel):
+    id: str
+    url: str
+    width: int
+    height: int
+    size: int
+
+
 class DocumentResponse(BaseModel):
     filename: str
     content: str
 
 
+class SessionDocumentResponse(BaseModel):
+    id: str
+    session_id: str
+    filename: str
+    size: int
+    chunk_count: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 # ── Memory ──
 class MemoryCreate(BaseModel):
     key: str
@@ -0,0 +1,215 @@
+"""
+Admission — Per-provider concurrency limits, queueing and retry.
+
+Every upstream call takes a slot from its provider's AdmissionController:
+- At most PROVIDER_MAX_IN_FLIGHT calls (PROVIDER_LIMITS overrides it per
+  provider) run at once; a streamed reply holds its slot until the
+  stream is closed
+- Further calls wait in a FIFO queue of PROVIDER_QUEUE_SIZE for at most
+  PROVIDER_QUEUE_TIMEOUT seconds
+- When the queue is full, or the wait runs out, the call fails fast with
+  Overloaded instead of piling more load onto a struggling provider
+
+run() retries rate-limited (429) and overloaded (503) responses with
+jittered exponential backoff, or after the provider's Retry-After when it
+sends one. The slot is given up while waiting to retry.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+import httpx
+from app.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {429, 503}
+
+# Recent queue waits kept per provider for the wait-time percentiles in stats()
+_WAIT_WINDOW = 500
+
+
+class Overloaded(Exception):
+    """A call was shed: the provider's queue was full or the wait timed out."""
+
+
+class AdmissionController:
+    """Limits in-flight calls to one provider, queueing the excess."""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._waits: deque[float] = deque(maxlen=_WAIT_WINDOW)
+        self.counters = {"admitted": 0, "queued": 0, "shed": 0, "timeouts": 0, "retries": 0}
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if none is free. Raises Overloaded."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            self._waits.append(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.counters["shed"] += 1
+            raise Overloaded(f"{self.name} is overloaded ({len(self._waiters)} requests waiting)")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.counters["queued"] += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait((future,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self.counters["timeouts"] += 1
+            raise Overloaded(f"{self.name} is overloaded (no capacity within {self.queue_timeout:g}s)")
+        # release() handed its slot straight to us, in_flight already counts it
+        self.counters["admitted"] += 1
+        self._waits.append(time.monotonic() - start)
+
+    def release(self):
+        """Give a slot back, or pass it to the longest waiting call."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _abandon(self, future: asyncio.Future):
+        """A waiter gave up (timeout or cancellation)."""
+        if future.done():
+            self.release()  # the slot reached us just as we gave up; pass it on
+        else:
+            future.cancel()
+            self._waiters.remove(future)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def percentile(q: float) -> float | None:
+            if not waits:
+                return None
+            return round(waits[min(int(len(waits) * q / 100), len(waits) - 1)] * 1000, 1)
+
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "wait_p50_ms": percentile(50),
+            "wait_p95_ms": percentile(95),
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else None,
+            **self.counters,
+        }
+
+
+_controllers: dict[str, AdmissionController] = {}
+
+
+def get_controller(provider: str) -> AdmissionController:
+    controller = _controllers.get(provider)
+    if controller is None:
+        controller = AdmissionController(
+            provider,
+            settings.PROVIDER_LIMITS.get(provider, settings.PROVIDER_MAX_IN_FLIGHT),
+            settings.PROVIDER_QUEUE_SIZE,
+            settings.PROVIDER_QUEUE_TIMEOUT,
+        )
+        _controllers[provider] = controller
+    return controller
+
+
+def release(provider: str):
+    """Release a slot kept by run(..., hold=True)."""
+    get_controller(provider).release()
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Seconds the provider asked us to wait (Retry-After / retry-after-ms), if it said."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error: Exception, attempt: int) -> float | None:
+    """
+    Seconds to wait before retrying after `error` on attempt `attempt`
+    (0-based), or None if it shouldn't be retried: not a 429/503, out of
+    attempts, or the provider asked for a longer wait than
+    LLM_RETRY_MAX_DELAY (better to fail over than to hold the user).
+    """
+    response = getattr(error, "response", None)
+    if not isinstance(response, httpx.Response) or response.status_code not in RETRYABLE_STATUSES:
+        return None
+    if attempt >= settings.LLM_MAX_RETRIES:
+        return None
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        if retry_after > settings.LLM_RETRY_MAX_DELAY:
+            return None
+        # A little jitter so callers told the same time don't all return at once
+        return retry_after + random.uniform(0, settings.LLM_RETRY_BASE_DELAY)
+    # Full jitter: uniform over [0, capped exponential]
+    return random.uniform(0, min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def run(provider: str, call: Callable[[], Awaitable[T]], hold: bool = False) -> T:
+    """
+    Run `call` under the provider's admission slot, retrying 429/503
+    responses (see retry_delay). With hold=True a successful call keeps its
+    slot; the caller gives it back with release(provider).
+
+    Raises Overloaded when shed, otherwise whatever the last attempt raised.
+    """
+    controller = get_controller(provider)
+    attempt = 0
+    while True:
+        await controller.acquire()
+        try:
+            result = await call()
+        except Exception as e:
+            controller.release()
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+        except BaseException:
+            controller.release()
+            raise
+        else:
+            if not hold:
+                controller.release()
+            return result
+        controller.counters["retries"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def stats() -> dict:
+    return {provider: controller.stats() for provider, controller in _controllers.items()}
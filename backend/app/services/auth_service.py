@@ -1,7 +1,11 @@
 import httpx
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import get_settings
 from app.models import User
 
@@ -38,6 +42,87 @@ def verify_token(token: str) -> dict | None:
         return None
 
 
+# ── Authenticated-user cache ──
+# Verified token -> user snapshot, so authenticated requests skip the JWT
+# decode and the users lookup. Entries live for AUTH_CACHE_TTL seconds
+# (never past the token's own expiry) and are dropped whenever the User
+# row changes. The cache is per process: another worker may serve a
+# changed user for up to AUTH_CACHE_TTL seconds.
+
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """Detached, immutable snapshot of a User — safe to cache and share across requests."""
+    id: str
+    email: str
+    display_name: str
+    provider: str
+    created_at: datetime
+
+    @classmethod
+    def from_model(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            display_name=user.display_name,
+            provider=user.provider,
+            created_at=user.created_at,
+        )
+
+
+_user_cache: OrderedDict[str, tuple[float, CurrentUser]] = OrderedDict()
+_tokens_by_user: dict[str, set[str]] = {}
+
+
+def get_cached_user(token: str) -> CurrentUser | None:
+    """Return the cached user for a token, or None if absent or expired."""
+    entry = _user_cache.get(token)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at <= time.time():
+        _forget_token(token)
+        return None
+    _user_cache.move_to_end(token)
+    return user
+
+
+def cache_user(token: str, user: CurrentUser, token_exp: float | None = None):
+    """Remember a verified token's user, evicting the least recently used entry when full."""
+    if settings.AUTH_CACHE_TTL <= 0:
+        return
+    expires_at = time.time() + settings.AUTH_CACHE_TTL
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    _user_cache[token] = (expires_at, user)
+    _user_cache.move_to_end(token)
+    _tokens_by_user.setdefault(user.id, set()).add(token)
+    while len(_user_cache) > settings.AUTH_CACHE_MAX_ENTRIES:
+        oldest = next(iter(_user_cache))
+        _forget_token(oldest)
+
+
+def invalidate_user(user_id: str):
+    """Drop every cached token for a user."""
+    for token in _tokens_by_user.pop(user_id, ()):
+        _user_cache.pop(token, None)
+
+
+def _forget_token(token: str):
+    entry = _user_cache.pop(token, None)
+    if entry is not None:
+        tokens = _tokens_by_user.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del _tokens_by_user[entry[1].id]
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User):
+    invalidate_user(target.id)
+
+
 def get_microsoft_auth_url() -> str:
     """Build the Microsoft OAuth2 authorization URL."""
     params = {
@@ -81,12 +166,12 @@ async def get_microsoft_user_info(access_token: str) -> dict:
         return resp.json()
 
 
-def get_or_create_user(db: Session, email: str, display_name: str, provider: str = "microsoft") -> User:
+async def get_or_create_user(db: AsyncSession, email: str, display_name: str, provider: str = "microsoft") -> User:
     """Find existing user by email or create a new one."""
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         user = User(email=email, display_name=display_name, provider=provider)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     return user
@@ -0,0 +1,165 @@
+"""
+Background — In-process queues for work that shouldn't hold up a response.
+
+- JobQueue: runs submitted coroutine functions on a small pool of workers
+- BatchQueue: collects items and hands them to a handler in batches, so
+  many small writes share one transaction
+
+Every queue registers itself here; main.lifespan starts them with
+start_all() and drains them with stop_all() on shutdown. Queues also
+start lazily on first use, so scripts outside the app still work.
+Queues are bounded: when one is full, new work is dropped and logged
+rather than growing memory without limit.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_queues: list["_Queue"] = []
+
+
+class _Queue(ABC):
+    """Shared lifecycle: bounded asyncio.Queue, worker tasks, draining stop."""
+
+    def __init__(self, name: str, workers: int, max_size: int):
+        self.name = name
+        self.workers = workers
+        self.max_size = max_size
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0}
+        _queues.append(self)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float):
+        """Wait up to `timeout` seconds for queued work to finish, then stop the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s: %d jobs left unfinished at shutdown", self.name, self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def _put(self, item) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            logger.warning("%s: queue full, dropping job", self.name)
+            return False
+        self.counters["submitted"] += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "workers": len(self._tasks),
+        }
+
+    @abstractmethod
+    async def _worker(self):
+        """Take work off self._queue forever, calling task_done() for each item."""
+
+
+class JobQueue(_Queue):
+    """Runs `fn(*args)` coroutines in the background, `workers` at a time."""
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args) -> bool:
+        """Queue a job. Returns False if the queue is full and the job was dropped."""
+        return self._put((fn, args))
+
+    async def _worker(self):
+        while True:
+            fn, args = await self._queue.get()
+            try:
+                await fn(*args)
+                self.counters["completed"] += 1
+            except Exception:
+                self.counters["failed"] += 1
+                logger.exception("%s: job %s failed", self.name, getattr(fn, "__name__", fn))
+            finally:
+                self._queue.task_done()
+
+
+class BatchQueue(_Queue):
+    """
+    Hands queued items to `handler(items)` in batches of up to `max_batch`,
+    waiting at most `max_delay` seconds for a batch to fill.
+    """
+
+    def __init__(self, name: str, handler: Callable[[list], Awaitable[None]],
+                 max_batch: int, max_delay: float, max_size: int):
+        super().__init__(name, workers=1, max_size=max_size)
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.counters["batches"] = 0
+
+    def submit(self, item) -> bool:
+        """Queue an item. Returns False if the queue is full and the item was dropped."""
+        return self._put(item)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.handler(batch)
+                self.counters["completed"] += len(batch)
+                self.counters["batches"] += 1
+            except Exception:
+                self.counters["failed"] += len(batch)
+                logger.exception("%s: batch of %d failed", self.name, len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# General-purpose queue for one-off background jobs (e.g. session summaries)
+jobs = JobQueue("jobs", workers=settings.BACKGROUND_WORKERS, max_size=settings.BACKGROUND_QUEUE_SIZE)
+
+
+def start_all():
+    """Start every registered queue. Called on app startup."""
+    for queue in _queues:
+        queue.start()
+
+
+async def stop_all():
+    """Drain and stop every registered queue. Called on app shutdown."""
+    for queue in _queues:
+        await queue.stop(settings.BACKGROUND_DRAIN_TIMEOUT)
+
+
+def stats() -> dict:
+    return {queue.name: queue.stats() for queue in _queues}
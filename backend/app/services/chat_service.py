@@ -2,61 +2,91 @@
 Chat Service — Session management and message handling.
 """
 
+import asyncio
+import logging
+import time
+import uuid
 from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import AsyncIterator
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.sql import Executable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from app.database import run_in_session
 from app.models import ChatSession, Message
+from app.pagination import Cursor, Page, keyset_page
+from app import tracing
 from app.config import get_settings
-from app.services import memory_service, model_router
+from app.metrics import timed_db
+from app.services import group_commit, image_store, memory_service, model_router, rag_service, summary_service
+from app.services.tokenizer import estimate_tokens
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
-def create_session(db: Session, user_id: str, title: str = "New Chat") -> ChatSession:
+@timed_db
+async def create_session(db: AsyncSession, user_id: str, title: str = "New Chat") -> ChatSession:
     """Create a new chat session for a user."""
     session = ChatSession(user_id=user_id, title=title)
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     return session
 
 
-def get_user_sessions(db: Session, user_id: str) -> list[ChatSession]:
-    """Get all chat sessions for a user, newest first."""
-    return (
-        db.query(ChatSession)
-        .filter(ChatSession.user_id == user_id)
-        .order_by(ChatSession.updated_at.desc())
-        .all()
+@timed_db
+async def get_user_sessions(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    before: Cursor | None = None,
+    after: Cursor | None = None,
+) -> Page:
+    """Get one page of a user's chat sessions, most recently updated first."""
+    query = (
+        select(ChatSession)
+        .where(ChatSession.user_id == user_id)
+        # The list only shows these; skip loading the (possibly long) summary
+        .options(load_only(ChatSession.id, ChatSession.title, ChatSession.created_at, ChatSession.updated_at))
+    )
+    return await keyset_page(
+        db, query, ChatSession.updated_at, ChatSession.id, limit, before, after, newest_first=True
     )
 
 
-def get_session(db: Session, session_id: str, user_id: str) -> ChatSession | None:
+@timed_db
+async def get_session(db: AsyncSession, session_id: str, user_id: str) -> ChatSession | None:
     """Get a specific session, ensuring it belongs to the user."""
-    return (
-        db.query(ChatSession)
-        .filter(ChatSession.id == session_id, ChatSession.user_id == user_id)
-        .first()
+    return await db.scalar(
+        select(ChatSession)
+        .where(ChatSession.id == session_id, ChatSession.user_id == user_id)
     )
 
 
-def delete_session(db: Session, session_id: str, user_id: str) -> bool:
-    """Delete a chat session and all its messages."""
-    session = get_session(db, session_id, user_id)
+@timed_db
+async def delete_session(db: AsyncSession, session_id: str, user_id: str) -> bool:
+    """Delete a chat session, its messages and its documents."""
+    session = await get_session(db, session_id, user_id)
     if not session:
         return False
-    db.delete(session)
-    db.commit()
+    await rag_service.delete_session_documents(db, session_id)
+    await db.delete(session)
+    await db.commit()
     return True
 
 
-def get_session_messages(db: Session, session_id: str) -> list[Message]:
-    """Get all messages in a session, oldest first."""
-    return (
-        db.query(Message)
-        .filter(Message.session_id == session_id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
+@timed_db
+async def get_session_messages(
+    db: AsyncSession,
+    session_id: str,
+    limit: int,
+    before: Cursor | None = None,
+    after: Cursor | None = None,
+) -> Page:
+    """Get one page of a session's messages (the latest page by default), oldest first."""
+    query = select(Message).where(Message.session_id == session_id)
+    return await keyset_page(db, query, Message.created_at, Message.id, limit, before, after)
 
 
 def _auto_title(content: str) -> str:
@@ -67,78 +97,332 @@ def _auto_title(content: str) -> str:
     return title
 
 
+def _new_message(session_id: str, role: str, content: str, **fields) -> Message:
+    """
+    A Message with its id and timestamp set here rather than by the
+    insert, so nothing has to be read back once it is written.
+    """
+    return Message(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        role=role,
+        content=content,
+        created_at=datetime.utcnow(),
+        **fields,
+    )
+
+
+def _insert(message: Message) -> Executable:
+    return insert(Message).values({column.key: getattr(message, column.key) for column in Message.__table__.columns})
+
+
+@timed_db
+async def _save_user_message(session_id: str, content: str, image_id: str | None) -> Message:
+    """Persist the user's side of a turn (group-committed)."""
+    user_msg = _new_message(
+        session_id, "user", content, image_url=image_store.url_for(image_id) if image_id else None
+    )
+    await group_commit.write(_insert(user_msg))
+    return user_msg
+
+
+def _history_budget(model_name: str | None, document_tokens: int = 0) -> int:
+    """
+    Tokens left for conversation history once the completion, the system
+    prompt, the memory and summary reservations and the retrieved document
+    excerpts are set aside.
+    """
+    return (
+        model_router.get_context_window(model_name)
+        - document_tokens
+        - settings.LLM_MAX_TOKENS
+        - estimate_tokens(settings.SYSTEM_PROMPT)
+        - settings.CONTEXT_MEMORY_TOKENS
+        - settings.CONTEXT_SUMMARY_TOKENS
+        - settings.CONTEXT_SAFETY_TOKENS
+    )
+
+
+async def _build_context(session_id: str, user_id: str, content: str, model_name: str | None) -> list[dict]:
+    """
+    Build the model context: system prompt + long-term memories and
+    document excerpts relevant to `content` + session summary + short-term
+    messages.
+
+    If messages have fallen out of the short-term window since the summary
+    was last updated, a background summary update is started.
+    """
+    # Document excerpts first: unlike memory and the summary they have no
+    # fixed reservation (most sessions have no documents), so the history
+    # gets whatever they leave. Served from the in-memory index when warm.
+    with tracing.span("context.documents"):
+        chunks = await run_in_session(rag_service.retrieve, session_id, content)
+    document_context = rag_service.format_document_context(chunks, settings.CONTEXT_DOCUMENT_TOKENS)
+    history_budget = _history_budget(model_name, estimate_tokens(document_context))
+
+    # Long-term memory, the short-term window and the session summary are
+    # independent reads, so run them concurrently, each on its own session.
+    with tracing.span("context.history"):
+        long_term, (short_term, left_out), (summary, summarized_until) = await asyncio.gather(
+            run_in_session(memory_service.get_long_term_memory, user_id, content),
+            run_in_session(memory_service.get_short_term_memory, session_id, history_budget),
+            run_in_session(summary_service.get_summary, session_id),
+        )
+    if summary_service.needs_update(left_out, summarized_until):
+        summary_service.schedule_update(session_id, left_out)
+    with tracing.span("context.images"):
+        await _attach_images(short_term)
+
+    # 1. System prompt + long-term memory + summary of older messages + documents
+    memory_context = memory_service.format_memory_context(long_term, settings.CONTEXT_MEMORY_TOKENS)
+    summary_context = summary_service.format_summary_context(summary)
+
+    system_content = settings.SYSTEM_PROMPT
+    if memory_context:
+        system_content += f"\n\n{memory_context}"
+    if summary_context:
+        system_content += f"\n\n{summary_context}"
+    if document_context:
+        system_content += f"\n\n{document_context}"
+
+    context_messages = [{"role": "system", "content": system_content}]
+
+    # 2. Short-term memory (recent messages in this session)
+    context_messages.extend(short_term)
+    return context_messages
+
+
+async def _attach_images(messages: list[dict]):
+    """
+    Load the IMAGE_HISTORY_LIMIT most recent images referenced by
+    `messages` (image_url) into them as data URLs for the model. Older
+    images are left out to bound vision cost.
+    """
+    wanted = []
+    for message in reversed(messages):
+        image_id = image_store.id_from_url(message.pop("image_url", None))
+        if image_id and len(wanted) < settings.IMAGE_HISTORY_LIMIT:
+            wanted.append((message, image_id))
+    data_urls = await asyncio.gather(*(image_store.load_data_url(image_id) for _, image_id in wanted))
+    for (message, _), data_url in zip(wanted, data_urls):
+        if data_url:
+            message["image"] = data_url
+
+
+def _touch_session(session_id: str, first_content: str) -> Executable:
+    """Statement bumping the session timestamp and auto-titling it on the first message."""
+    return (
+        update(ChatSession)
+        .where(ChatSession.id == session_id)
+        .values(
+            updated_at=datetime.utcnow(),
+            title=case((ChatSession.title == "New Chat", _auto_title(first_content)), else_=ChatSession.title),
+        )
+    )
+
+
 async def send_message(
-    db: Session,
     session_id: str,
     user_id: str,
     content: str,
     model_name: str | None = None,
-    image_base64: str | None = None,
+    image_id: str | None = None,
 ) -> tuple[Message, Message]:
     """
     Process a user message:
-    1. Save user message to DB
-    2. Build context (system prompt + long-term memory + short-term messages)
+    1. Save user message (with a reference to its image, if any) to DB
+    2. Build context (system prompt + long-term memory + short-term messages,
+       with the most recent images)
     3. Send to AI model
     4. Save assistant response to DB
     5. Extract memories from user message
     6. Auto-title session if it's the first message
 
+    Both writes go through group_commit, and each returns once durable.
+    Each stage is a tracing span.
+
     Returns: (user_message, assistant_message)
     """
-    # Save user message
-    user_msg = Message(
-        session_id=session_id,
-        role="user",
-        content=content,
-        image_url="[image attached]" if image_base64 else None,
-    )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
+    with tracing.span("chat.save_user_message"):
+        user_msg = await _save_user_message(session_id, content, image_id)
 
-    # Build context
-    # 1. System prompt + long-term memory
-    long_term = memory_service.get_long_term_memory(db, user_id)
-    memory_context = memory_service.format_memory_context(long_term)
+    with tracing.span("chat.build_context"):
+        context_messages = await _build_context(session_id, user_id, content, model_name)
 
-    system_content = settings.SYSTEM_PROMPT
-    if memory_context:
-        system_content += f"\n\n{memory_context}"
+    # Get AI response
+    with tracing.span("chat.llm", model=model_name or settings.DEFAULT_MODEL):
+        ai_response = await model_router.get_ai_response(
+            messages=context_messages,
+            model_name=model_name,
+        )
 
-    context_messages = [{"role": "system", "content": system_content}]
+    # Save assistant message
+    with tracing.span("chat.save_reply"):
+        assistant_msg = _new_message(
+            session_id,
+            "assistant",
+            ai_response,
+            model=model_name or settings.DEFAULT_MODEL,
+            parent_id=user_msg.id,
+        )
+        await group_commit.write(_insert(assistant_msg), _touch_session(session_id, content))
 
-    # 2. Short-term memory (recent messages in this session)
-    short_term = memory_service.get_short_term_memory(db, session_id)
-    context_messages.extend(short_term)
+    # Extract memories from user message (background, batched)
+    with tracing.span("chat.queue_memory_extraction"):
+        memory_service.queue_memory_extraction(user_id, content)
 
-    # 3. Get AI response
-    ai_response = await model_router.get_ai_response(
-        messages=context_messages,
-        model_name=model_name,
-        image_base64=image_base64,
-    )
+    return user_msg, assistant_msg
 
-    # Save assistant message
-    assistant_msg = Message(
-        session_id=session_id,
-        role="assistant",
-        content=ai_response,
-    )
-    db.add(assistant_msg)
 
-    # Update session timestamp
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if session:
-        session.updated_at = datetime.utcnow()
-        # Auto-title on first message
-        if session.title == "New Chat":
-            session.title = _auto_title(content)
+async def stream_message(
+    session_id: str,
+    user_id: str,
+    content: str,
+    model_name: str | None = None,
+    image_id: str | None = None,
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Streaming variant of send_message.
+
+    Yields ("user_message", Message) once the user message is saved, then
+    ("delta", str) for every chunk of the reply, and finally
+    ("assistant_message", Message) once the reply is complete and committed.
 
-    db.commit()
-    db.refresh(assistant_msg)
+    The assistant message is written to the DB every STREAM_FLUSH_INTERVAL
+    seconds while the reply is being generated, so a crashed worker or a
+    dropped client leaves the partial answer behind instead of nothing.
+    """
+    with tracing.span("chat.save_user_message"):
+        user_msg = await _save_user_message(session_id, content, image_id)
+    yield "user_message", user_msg
 
-    # Extract memories from user message (async, non-blocking)
-    memory_service.extract_and_store_memories(db, user_id, content)
+    with tracing.span("chat.build_context"):
+        context_messages = await _build_context(session_id, user_id, content, model_name)
 
-    return user_msg, assistant_msg
+    parts: list[str] = []
+    assistant_msg: Message | None = None
+    last_flush = time.monotonic()
+
+    async def flush(*statements: Executable):
+        """Write the reply so far, plus `statements`, in one group commit."""
+        nonlocal assistant_msg, last_flush
+        text = "".join(parts)
+        if assistant_msg is None:
+            assistant_msg = _new_message(
+                session_id,
+                "assistant",
+                text,
+                model=model_name or settings.DEFAULT_MODEL,
+                parent_id=user_msg.id,
+            )
+            write = _insert(assistant_msg)
+        else:
+            assistant_msg.content = text
+            write = update(Message).where(Message.id == assistant_msg.id).values(content=text)
+        await group_commit.write(write, *statements)
+        last_flush = time.monotonic()
+
+    completed = False
+    # Not entered: the span would otherwise stay current across the yields
+    llm_span = tracing.span("chat.llm", model=model_name or settings.DEFAULT_MODEL)
+    try:
+        async for delta in model_router.stream_ai_response(
+            messages=context_messages,
+            model_name=model_name,
+        ):
+            parts.append(delta)
+            yield "delta", delta
+            if time.monotonic() - last_flush >= settings.STREAM_FLUSH_INTERVAL:
+                await flush()
+        completed = True
+    finally:
+        llm_span.set("chunks", len(parts))
+        llm_span.end()
+        if not completed and parts:
+            # Client went away mid-stream — keep what we have
+            await flush()
+
+    with tracing.span("chat.save_reply"):
+        await flush(_touch_session(session_id, content))
+
+    with tracing.span("chat.queue_memory_extraction"):
+        memory_service.queue_memory_extraction(user_id, content)
+
+    yield "assistant_message", assistant_msg
+
+
+async def fan_out_message(
+    session_id: str,
+    user_id: str,
+    content: str,
+    model_names: list[str],
+    image_id: str | None = None,
+    timeout: float | None = None,
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Answer one user message with several models at once, for comparing them.
+
+    The user message is saved and the context built once (sized for the
+    model with the smallest context window), then every model is called
+    concurrently, pinned to that model (no fallbacks) and given at most
+    `timeout` seconds (FANOUT_MODEL_TIMEOUT by default). The turn takes as
+    long as the slowest model rather than the sum of them all.
+
+    Yields ("user_message", Message), then one event per model as it
+    finishes: ("assistant_message", Message), saved as a sibling reply
+    with its model and parent_id, or ("model_error", {"model", "error"})
+    for a model that failed or timed out (nothing is saved for it).
+    """
+    timeout = min(timeout or settings.FANOUT_MODEL_TIMEOUT, settings.FANOUT_MODEL_TIMEOUT)
+
+    with tracing.span("chat.save_user_message"):
+        user_msg = await _save_user_message(session_id, content, image_id)
+    yield "user_message", user_msg
+
+    smallest = min(model_names, key=model_router.get_context_window)
+    with tracing.span("chat.build_context"):
+        context_messages = await _build_context(session_id, user_id, content, smallest)
+
+    async def answer(name: str) -> tuple[str, Message | None, str | None]:
+        """(model, saved reply, error). Anything one model raises becomes its own error."""
+        with tracing.span("chat.llm", model=name):
+            try:
+                if not model_router.is_available(name):
+                    # No credentials: the same demo echo send_message gives
+                    reply = await model_router.get_ai_response(context_messages, name)
+                else:
+                    reply = await asyncio.wait_for(model_router.complete(context_messages, name, failover=False), timeout)
+            except asyncio.TimeoutError:
+                return name, None, f"{name} did not answer within {timeout:g}s"
+            except model_router.ModelError as e:
+                return name, None, str(e)
+            except Exception as e:
+                logger.exception("Fan-out to %s failed", name)
+                return name, None, f"Error communicating with {name}: {e}"
+        try:
+            with tracing.span("chat.save_reply", model=name):
+                assistant_msg = _new_message(session_id, "assistant", reply, model=name, parent_id=user_msg.id)
+                await group_commit.write(_insert(assistant_msg))
+        except Exception as e:
+            logger.exception("Saving %s's fan-out reply failed", name)
+            return name, None, f"Could not save {name}'s reply: {e}"
+        return name, assistant_msg, None
+
+    tasks = [asyncio.create_task(answer(name)) for name in model_names]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            name, assistant_msg, error = await finished
+            if error is not None:
+                yield "model_error", {"model": name, "error": error}
+                continue
+            yield "assistant_message", assistant_msg
+    finally:
+        # The client went away: stop the models still working
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    await group_commit.write(_touch_session(session_id, content))
+
+    with tracing.span("chat.queue_memory_extraction"):
+        memory_service.queue_memory_extraction(user_id, content)
@@ -0,0 +1,154 @@
+"""
+Coalesce — Single-flight sharing of identical in-flight requests.
+
+When several users send the same prompt to the same model at the same
+moment (a class trying a demo question), only the first request goes
+upstream; the others attach to it and get the same answer:
+- call(): non-streaming; every waiter gets the leader's result or error
+- stream(): the upstream stream runs in its own task and its chunks are
+  kept, so a waiter that attaches late first gets a replay of everything
+  produced so far, then the rest live
+
+The upstream call is cancelled only when every waiter has gone away.
+Flights are keyed like the response cache (response_cache.request_key)
+and forgotten once they finish; repeats after that are the cache's job.
+
+Opt-in per model via COALESCE_MODELS: coalesced users share one sample,
+which is only right for models where that's acceptable.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from app.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+counters = {"leaders": 0, "coalesced": 0}
+
+
+class FlightCancelled(Exception):
+    """The shared upstream stream was cancelled before it finished."""
+
+
+def enabled_for(model_name: str) -> bool:
+    return model_name in settings.COALESCE_MODELS or "*" in settings.COALESCE_MODELS
+
+
+# ── Non-streaming ──
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_calls: dict[str, _Call] = {}
+
+
+async def call(key: str, produce: Callable[[], Awaitable[T]]) -> T:
+    """Await `produce()`, or the identical call already in flight under `key`."""
+    flight = _calls.get(key)
+    if flight is None:
+        flight = _Call(asyncio.ensure_future(produce()))
+        flight.task.add_done_callback(lambda _: _forget(_calls, key, flight))
+        _calls[key] = flight
+        counters["leaders"] += 1
+    else:
+        counters["coalesced"] += 1
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Forgotten first, so a request arriving now starts a new flight
+            # instead of joining this dying one
+            _forget(_calls, key, flight)
+            flight.task.cancel()
+
+
+# ── Streaming ──
+
+class _Stream:
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.waiters = 0
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.get_running_loop().create_future()
+
+    def notify(self):
+        self._changed.set_result(None)
+        self._changed = asyncio.get_running_loop().create_future()
+
+    async def changed(self):
+        # Shielded: a waiter being cancelled must not cancel the shared future
+        await asyncio.shield(self._changed)
+
+
+_streams: dict[str, _Stream] = {}
+
+
+async def _pump(flight: _Stream, source: AsyncIterator[str]):
+    try:
+        async for chunk in source:
+            flight.chunks.append(chunk)
+            flight.notify()
+    except Exception as e:
+        flight.error = e
+    except asyncio.CancelledError:
+        # Anyone still following must see a failure, not a complete reply
+        flight.error = FlightCancelled("The shared upstream stream was cancelled")
+        raise
+    finally:
+        await source.aclose()
+        flight.done = True
+        flight.notify()
+
+
+async def stream(key: str, produce: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Yield the chunks of `produce()`, or replay and follow the identical stream already in flight under `key`."""
+    flight = _streams.get(key)
+    if flight is None:
+        flight = _Stream()
+        flight.task = asyncio.ensure_future(_pump(flight, produce()))
+        flight.task.add_done_callback(lambda _: _forget(_streams, key, flight))
+        _streams[key] = flight
+        counters["leaders"] += 1
+    else:
+        counters["coalesced"] += 1
+
+    flight.waiters += 1
+    try:
+        position = 0
+        while True:
+            while position < len(flight.chunks):
+                yield flight.chunks[position]
+                position += 1
+            if flight.done:
+                break
+            await flight.changed()
+        if flight.error is not None:
+            raise flight.error
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.done:
+            _forget(_streams, key, flight)
+            flight.task.cancel()
+
+
+def _forget(flights: dict, key: str, flight):
+    if flights.get(key) is flight:
+        del flights[key]
+
+
+def stats() -> dict:
+    return {
+        **counters,
+        "in_flight": len(_calls) + len(_streams),
+        "models": settings.COALESCE_MODELS,
+    }
@@ -0,0 +1,178 @@
+"""
+Document Cache — Content-addressed store for extracted document text.
+
+Keyed on the SHA-256 of the uploaded bytes (plus file type), so uploading
+the same file again skips extraction entirely. Entries are plain files
+under DOCUMENT_CACHE_DIR, which makes the store shared by every worker on
+the host:
+- Writes go to a temp file that is os.replace()d into place, so a reader
+  never sees a partial entry
+- A hit bumps the file's mtime; once the directory grows past
+  DOCUMENT_CACHE_MAX_BYTES the least recently used files are removed,
+  down to _EVICT_TO of it so the next eviction is a while off
+- Stores don't scan the directory: each worker keeps a running total
+  (the last scan plus its own writes since) and only scans when that goes
+  over the budget, or every _RESCAN_SECONDS to count other workers' writes
+- Any worker may evict; files already removed by another are skipped
+
+Counters (hits, bytes_saved, ...) are per process.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from app.config import get_settings
+
+settings = get_settings()
+
+# Bump when extraction output changes, so stale entries stop matching
+EXTRACTOR_VERSION = 1
+
+# Temp files older than this were left by a worker that died mid-write
+_STALE_TMP_SECONDS = 3600
+
+# Longest a worker relies on its running total before rescanning the directory
+_RESCAN_SECONDS = 60
+
+# An eviction frees space down to this share of max_bytes
+_EVICT_TO = 0.9
+
+
+class DocumentCache:
+    """Size-bounded, LRU-by-mtime directory of extracted texts."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "bytes_saved": 0,  # upload bytes whose extraction was skipped
+            "scans": 0,
+        }
+        self._total_bytes: int | None = None  # running estimate of the directory's size; None until scanned
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}-{extension}-v{EXTRACTOR_VERSION}.txt")
+
+    async def get(self, digest: str, extension: str, upload_size: int) -> str | None:
+        text = await asyncio.to_thread(self._read, self._path(digest, extension))
+        if text is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.counters["bytes_saved"] += upload_size
+        return text
+
+    async def set(self, digest: str, extension: str, text: str):
+        size = await asyncio.to_thread(self._write, self._path(digest, extension), text)
+        self.counters["stores"] += 1
+        if self._total_bytes is not None:
+            self._total_bytes += size
+        if (
+            self._total_bytes is None
+            or self._total_bytes > self.max_bytes
+            or time.monotonic() - self._scanned_at > _RESCAN_SECONDS
+        ):
+            self._scanned_at = time.monotonic()
+            removed, self._total_bytes = await asyncio.to_thread(self._evict)
+            self.counters["scans"] += 1
+            self.counters["evictions"] += removed
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _read(self, path: str) -> str | None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another worker since we opened it
+        return text
+
+    def _write(self, path: str, text: str) -> int:
+        """Store an entry; returns its size in bytes."""
+        data = text.encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return len(data)
+
+    def _evict(self) -> tuple[int, int]:
+        """
+        Scan the store and, if it is over max_bytes, remove least recently
+        used entries down to _EVICT_TO of it. Returns (entries removed, bytes left).
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if stat.st_mtime < time.time() - _STALE_TMP_SECONDS:
+                        self._unlink(entry.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return 0, total
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * _EVICT_TO:
+                break
+            removed += self._unlink(path)
+            total -= size
+        return removed, total
+
+    @staticmethod
+    def _unlink(path: str) -> int:
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0  # already removed by another worker
+
+
+_cache: DocumentCache | None = None
+
+
+def get_cache() -> DocumentCache | None:
+    """The process-wide cache, or None when DOCUMENT_CACHE_ENABLED is off."""
+    global _cache
+    if not settings.DOCUMENT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = DocumentCache(settings.DOCUMENT_CACHE_DIR, settings.DOCUMENT_CACHE_MAX_BYTES)
+    return _cache
+
+
+def stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
@@ -1,34 +1,205 @@
-import io
+"""
+Document Service — Text extraction from uploaded PDF, DOCX and TXT files.
+
+Parsing is CPU-bound (PyPDF2 especially), so it runs in a process pool
+rather than on the event loop, where one large PDF would stall every other
+request on the worker. Uploads are spooled to a temp file in chunks
+(never held in memory whole) and capped at MAX_UPLOAD_BYTES; PDFs are
+capped at MAX_DOCUMENT_PAGES and their pages extracted in parallel ranges
+of DOCUMENT_PAGES_PER_CHUNK, reporting progress as each range finishes.
+Results are cached by content hash (document_cache), so uploading the same
+file again returns without extracting.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import AsyncIterator
 import PyPDF2
 from docx import Document
 from fastapi import UploadFile
+from app.config import get_settings
+from app.services import document_cache
+
+settings = get_settings()
+
+SUPPORTED_EXTENSIONS = {"pdf", "docx", "txt"}
+
+# Bytes read from the upload per await while spooling it to disk
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class DocumentTooLarge(ValueError):
+    """The upload exceeds MAX_UPLOAD_BYTES or MAX_DOCUMENT_PAGES."""
+
+
+@dataclass(frozen=True, slots=True)
+class SavedUpload:
+    """An upload spooled to disk, with the SHA-256 of its bytes."""
+    path: str
+    filename: str
+    sha256: str
+    size: int
+
 
-def extract_text_from_file(file: io.BytesIO, filename: str) -> str:
-    """Extract text from PDF, DOCX, or TXT files."""
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: forking a process that runs an event loop and
+        # thread pools can deadlock the child
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.DOCUMENT_WORKERS or None,
+            mp_context=get_context("spawn"),
+        )
+    return _executor
+
+
+def close_executor():
+    """Shut down the extraction processes. Called on app shutdown."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_in_pool(fn, *args):
+    """
+    Run fn(*args) in the extraction process pool, replacing the pool if a
+    worker died. fn must be a module-level (picklable) function.
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    except BrokenProcessPool:
+        _executor = None
+        raise
+
+
+def _extension(filename: str) -> str:
     extension = filename.split(".")[-1].lower()
-    
-    if extension == "pdf":
-        return _extract_from_pdf(file)
-    elif extension == "docx":
-        return _extract_from_docx(file)
-    elif extension == "txt":
-        return _extract_from_txt(file)
-    else:
+    if extension not in SUPPORTED_EXTENSIONS:
         raise ValueError(f"Unsupported file type: {extension}")
+    return extension
 
-def _extract_from_pdf(file: io.BytesIO) -> str:
-    reader = PyPDF2.PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
 
-def _extract_from_docx(file: io.BytesIO) -> str:
-    doc = Document(file)
+async def save_upload(file: UploadFile) -> SavedUpload:
+    """
+    Spool an upload to a temp file, MAX_UPLOAD_BYTES at most, hashing it on
+    the way. The caller deletes the file (SavedUpload.path) when done.
+    """
+    # Only the extension goes into the temp name: the client's filename may be any length
+    fd, path = tempfile.mkstemp(suffix=f".{_extension(file.filename)}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise DocumentTooLarge(f"File is larger than {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SavedUpload(path=path, filename=file.filename, sha256=digest.hexdigest(), size=size)
+
+
+async def iter_extraction(upload: SavedUpload) -> AsyncIterator[tuple[str, object]]:
+    """
+    Extract text from a saved upload, yielding:
+    - ("progress", {"pages_done": n, "pages_total": total}) as PDF pages finish
+    - ("text", str) once, at the end
+
+    A file extracted before is served from the document cache without
+    any progress events.
+
+    Raises ValueError for unsupported or unreadable files and
+    DocumentTooLarge for PDFs over MAX_DOCUMENT_PAGES.
+    """
+    extension = _extension(upload.filename)
+    cache = document_cache.get_cache()
+    if cache is not None:
+        text = await cache.get(upload.sha256, extension, upload.size)
+        if text is not None:
+            yield "text", text
+            return
+
+    async for kind, payload in _extract(upload.path, extension):
+        if kind == "text" and cache is not None:
+            await cache.set(upload.sha256, extension, payload)
+        yield kind, payload
+
+
+async def extract_text(upload: SavedUpload) -> str:
+    """Extract the full text of a saved upload (iter_extraction without progress)."""
     text = ""
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
+    async for kind, payload in iter_extraction(upload):
+        if kind == "text":
+            text = payload
     return text
 
-def _extract_from_txt(file: io.BytesIO) -> str:
-    return file.read().decode("utf-8")
+
+async def _extract(path: str, extension: str) -> AsyncIterator[tuple[str, object]]:
+    if extension == "docx":
+        yield "text", await run_in_pool(_extract_from_docx, path)
+        return
+    if extension == "txt":
+        yield "text", await run_in_pool(_extract_from_txt, path)
+        return
+
+    total = await run_in_pool(_pdf_page_count, path)
+    if total > settings.MAX_DOCUMENT_PAGES:
+        raise DocumentTooLarge(f"PDF has {total} pages; the limit is {settings.MAX_DOCUMENT_PAGES}")
+    yield "progress", {"pages_done": 0, "pages_total": total}
+
+    step = settings.DOCUMENT_PAGES_PER_CHUNK
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+    tasks = [asyncio.ensure_future(run_in_pool(_extract_pdf_pages, path, start, end)) for start, end in ranges]
+    parts: list[list[tuple[int, str]]] = []
+    done = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            pages = await next_done
+            parts.append(pages)
+            done += len(pages)
+            yield "progress", {"pages_done": done, "pages_total": total}
+    finally:
+        # Client went away or a range failed: don't leave work queued in the pool
+        for task in tasks:
+            task.cancel()
+
+    # Ranges finish in any order; restore page order, then join once
+    parts.sort(key=lambda pages: pages[0][0])
+    yield "text", "".join(f"{text}\n" for pages in parts for _, text in pages)
+
+
+# ── Process-pool workers (module-level so they can be pickled) ──
+
+def _pdf_page_count(path: str) -> int:
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """Extract pages [start, end) as (page number, text) pairs."""
+    reader = PyPDF2.PdfReader(path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _extract_from_docx(path: str) -> str:
+    doc = Document(path)
+    return "".join(f"{paragraph.text}\n" for paragraph in doc.paragraphs)
+
+
+def _extract_from_txt(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8")
@@ -0,0 +1,93 @@
+"""
+Group Commit — Many concurrent requests' writes share one transaction.
+
+Every commit is a round-trip and, on SQLite, an fsync by the single
+writer, so under load the chat write path queues behind commits. write()
+hands its statements to a BatchQueue instead: whatever arrives within
+WRITE_BATCH_DELAY (up to WRITE_BATCH_SIZE callers) is executed in one
+transaction, and each caller is resumed only once that transaction has
+committed, so an acknowledged write is as durable as a direct commit.
+
+If a batch fails, its writes are retried one transaction per caller, so
+one bad write (e.g. a session deleted meanwhile) only fails its own
+caller.
+
+Callers generate ids and timestamps themselves (see chat_service), so
+nothing has to be read back after the insert.
+"""
+
+import asyncio
+from sqlalchemy.sql import Executable
+from app.config import get_settings
+from app.database import engine
+from app.services import background
+
+settings = get_settings()
+
+counters = {"writes": 0, "direct": 0, "retried": 0}
+
+
+async def _execute(statements: tuple[Executable, ...]):
+    async with engine.begin() as conn:
+        for statement in statements:
+            await conn.execute(statement)
+
+
+async def _commit_batch(items: list[tuple[tuple[Executable, ...], asyncio.Future]]):
+    """BatchQueue handler: run every caller's statements in one transaction, then resume them."""
+    try:
+        async with engine.begin() as conn:
+            for statements, _ in items:
+                for statement in statements:
+                    await conn.execute(statement)
+    except Exception:
+        # Find the culprit: one transaction per caller
+        counters["retried"] += len(items)
+        for statements, future in items:
+            try:
+                await _execute(statements)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(None)
+        return
+    for _, future in items:
+        if not future.done():
+            future.set_result(None)
+
+
+_queue = background.BatchQueue(
+    "group_commit",
+    _commit_batch,
+    max_batch=settings.WRITE_BATCH_SIZE,
+    max_delay=settings.WRITE_BATCH_DELAY,
+    max_size=settings.WRITE_BATCH_QUEUE_SIZE,
+)
+
+
+async def write(*statements: Executable):
+    """
+    Execute `statements` in order, in one transaction with other callers'
+    writes. Returns once they are committed; raises what they raised.
+    """
+    counters["writes"] += 1
+    if settings.WRITE_BATCHING_ENABLED:
+        future = asyncio.get_running_loop().create_future()
+        if _queue.submit((statements, future)):
+            # Shielded: a caller that goes away doesn't take the rest of the batch with it
+            await asyncio.shield(future)
+            return
+    # Batching off, or the queue is full: commit on our own
+    counters["direct"] += 1
+    await _execute(statements)
+
+
+def stats() -> dict:
+    return {
+        **counters,
+        "enabled": settings.WRITE_BATCHING_ENABLED,
+        "batches": _queue.counters["batches"],
+        "queued": _queue.stats()["queued"],
+    }
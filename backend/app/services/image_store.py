@@ -0,0 +1,184 @@
+"""
+Image Store — Content-addressed on-disk store for chat images.
+
+Uploaded images are normalized once, on upload, in the document process
+pool (decoding and resampling are CPU-bound):
+- EXIF rotation applied, then downscaled to what providers actually use:
+  longest side IMAGE_MAX_SIDE and shortest side IMAGE_MAX_SHORT_SIDE
+  (OpenAI resizes high-detail images to fit 2048 x 768 anyway, so larger
+  uploads only add transfer time and latency)
+- Re-encoded as JPEG (IMAGE_JPEG_QUALITY), or PNG if it has transparency
+
+The result is stored under IMAGE_STORE_DIR as <sha256>.<ext>; that name is
+the image id. Messages keep a URL to it (Message.image_url), so images
+are served with long-lived caching and can be sent again with later turns.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from fastapi import UploadFile
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+from app.config import get_settings
+from app.services import document_service
+
+settings = get_settings()
+
+URL_PREFIX = "/api/chat/images/"
+
+MIME_TYPES = {"jpg": "image/jpeg", "png": "image/png"}
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.(jpg|png)$")
+
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageTooLarge(ValueError):
+    """The upload exceeds MAX_IMAGE_UPLOAD_BYTES or IMAGE_MAX_PIXELS."""
+
+
+@dataclass(frozen=True, slots=True)
+class StoredImage:
+    id: str
+    url: str
+    width: int
+    height: int
+    size: int
+
+
+def _normalize(data: bytes, max_side: int, max_short_side: int, max_pixels: int, quality: int):
+    """
+    Decode, orient, downscale and re-encode an image. Returns
+    (encoded bytes, extension, width, height). Runs in the process pool.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > max_pixels:
+            raise ImageTooLarge(f"Image is {image.width}x{image.height}, over the {max_pixels} pixel limit")
+        scale = min(1.0, max_side / max(image.size), max_short_side / min(image.size))
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # For JPEG, decode at a reduced scale directly (much faster than full decode + resize)
+        image.draft("RGB", target)
+        # Orientations 5-8 rotate by 90°, so the upright image's target is the other way round
+        if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            target = target[::-1]
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError("Unsupported or corrupt image") from e
+
+    transparent = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if transparent else "RGB")
+    if image.width > target[0] or image.height > target[1]:
+        image.thumbnail(target, Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    if transparent:
+        image.save(out, "PNG", optimize=True)
+        extension = "png"
+    else:
+        image.save(out, "JPEG", quality=quality, optimize=True)
+        extension = "jpg"
+    return out.getvalue(), extension, image.width, image.height
+
+
+def _path(image_id: str) -> str:
+    return os.path.join(settings.IMAGE_STORE_DIR, image_id[:2], image_id)
+
+
+def _write(path: str, data: bytes):
+    """Atomically write a store entry, unless it already exists (same hash, same bytes)."""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+async def save_bytes(data: bytes) -> StoredImage:
+    """Normalize and store an image. Raises ValueError (ImageTooLarge) for bad input."""
+    encoded, extension, width, height = await document_service.run_in_pool(
+        _normalize,
+        data,
+        settings.IMAGE_MAX_SIDE,
+        settings.IMAGE_MAX_SHORT_SIDE,
+        settings.IMAGE_MAX_PIXELS,
+        settings.IMAGE_JPEG_QUALITY,
+    )
+    image_id = f"{hashlib.sha256(encoded).hexdigest()}.{extension}"
+    await asyncio.to_thread(_write, _path(image_id), encoded)
+    return StoredImage(image_id, url_for(image_id), width, height, len(encoded))
+
+
+async def save_upload(file: UploadFile) -> StoredImage:
+    """Read a multipart upload (at most MAX_IMAGE_UPLOAD_BYTES) and store it."""
+    buffer = bytearray()
+    while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > settings.MAX_IMAGE_UPLOAD_BYTES:
+            raise ImageTooLarge(f"Image exceeds the {settings.MAX_IMAGE_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+    return await save_bytes(bytes(buffer))
+
+
+async def save_base64(image_base64: str) -> StoredImage:
+    """Store an image sent inline as base64 (the older JSON upload path)."""
+    try:
+        data = base64.b64decode(image_base64, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Invalid base64 image") from e
+    if len(data) > settings.MAX_IMAGE_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Image exceeds the {settings.MAX_IMAGE_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+    return await save_bytes(data)
+
+
+def is_valid_id(image_id: str) -> bool:
+    return bool(_ID_PATTERN.match(image_id))
+
+
+def path_for(image_id: str) -> str | None:
+    """Filesystem path of a stored image, or None if the id is malformed or unknown."""
+    if not is_valid_id(image_id):
+        return None
+    path = _path(image_id)
+    return path if os.path.exists(path) else None
+
+
+def url_for(image_id: str) -> str:
+    return URL_PREFIX + image_id
+
+
+def id_from_url(url: str | None) -> str | None:
+    """The image id in a Message.image_url, or None (no image, or a pre-store placeholder)."""
+    if not url or not url.startswith(URL_PREFIX):
+        return None
+    image_id = url[len(URL_PREFIX):]
+    return image_id if is_valid_id(image_id) else None
+
+
+async def load_data_url(image_id: str) -> str | None:
+    """The stored image as a data: URL for a provider request, or None if it's gone."""
+    path = path_for(image_id)
+    if path is None:
+        return None
+    try:
+        data = await asyncio.to_thread(_read, path)
+    except FileNotFoundError:
+        return None
+    mime = MIME_TYPES[image_id.rsplit(".", 1)[1]]
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,85 @@
+"""
+Memory Index — Per-user relevance index over long-term memories.
+
+Each user's memories ("key: value") are held in a BM25Index so a chat turn
+can ask for the few memories relevant to the current message instead of
+injecting the most recent 50. An index is built from the DB the first
+time a user is queried, then kept current in place by save_memory and
+memory extraction (see memory_service). Indexes for the
+MEMORY_INDEX_MAX_USERS most recently active users are kept; each is
+rebuilt after MEMORY_INDEX_TTL seconds so writes from other workers are
+picked up.
+"""
+
+import time
+from datetime import datetime
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.models import MemoryStore
+from app.services.search_index import BM25Index
+
+settings = get_settings()
+
+
+class _UserIndex:
+    def __init__(self):
+        self.index = BM25Index()
+        self.memories: dict[int, dict] = {}  # memory id -> {"key", "value", "category", "created_at"}
+        self.built_at = time.monotonic()
+
+    def put(self, memory_id: int, key: str, value: str, category: str, created_at):
+        self.memories[memory_id] = {"key": key, "value": value, "category": category, "created_at": created_at}
+        self.index.add(memory_id, f"{key} {value}")
+
+    def recent(self, limit: int, exclude: set[int]) -> list[int]:
+        ordered = sorted(self.memories, key=lambda i: self.memories[i]["created_at"] or datetime.min, reverse=True)
+        return [i for i in ordered if i not in exclude][:limit]
+
+
+_indexes: OrderedDict[str, _UserIndex] = OrderedDict()
+
+
+async def _get_index(db: AsyncSession, user_id: str) -> _UserIndex:
+    user_index = _indexes.get(user_id)
+    if user_index is not None and time.monotonic() - user_index.built_at < settings.MEMORY_INDEX_TTL:
+        _indexes.move_to_end(user_id)
+        return user_index
+
+    user_index = _UserIndex()
+    rows = await db.execute(
+        select(MemoryStore.id, MemoryStore.key, MemoryStore.value, MemoryStore.category, MemoryStore.created_at)
+        .where(MemoryStore.user_id == user_id)
+    )
+    for row in rows:
+        user_index.put(*row)
+    _indexes[user_id] = user_index
+    _indexes.move_to_end(user_id)
+    while len(_indexes) > settings.MEMORY_INDEX_MAX_USERS:
+        _indexes.popitem(last=False)
+    return user_index
+
+
+async def search(db: AsyncSession, user_id: str, query: str, k: int) -> list[dict]:
+    """
+    Return the user's k memories most relevant to `query`, best first.
+    If fewer than k match at all, the rest are filled with the most recent.
+    """
+    user_index = await _get_index(db, user_id)
+    ids = [memory_id for memory_id, _ in user_index.index.search(query, k)]
+    if len(ids) < k:
+        ids += user_index.recent(k - len(ids), exclude=set(ids))
+    return [user_index.memories[i] for i in ids]
+
+
+def on_saved(user_id: str, memory: MemoryStore):
+    """Reflect a committed insert/update in the user's index, if it's loaded."""
+    user_index = _indexes.get(user_id)
+    if user_index is not None:
+        user_index.put(memory.id, memory.key, memory.value, memory.category, memory.created_at)
+
+
+def on_cleared(user_id: str):
+    """Forget a user's index after their memories were deleted."""
+    _indexes.pop(user_id, None)
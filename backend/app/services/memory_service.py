@@ -1,14 +1,22 @@
 """
 Memory Service — Short-term and long-term memory management.
 
-Short-term: Last N messages from the current session (configurable via MEMORY_WINDOW).
-Long-term: User-specific facts/preferences stored in MemoryStore table.
+Short-term: Most recent messages from the current session that fit the
+            model's token budget (at most MEMORY_WINDOW messages).
+Long-term: User-specific facts/preferences stored in MemoryStore table,
+           retrieved by relevance to the current message (memory_index).
 """
 
 import re
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal
 from app.models import Message, MemoryStore
+from app.pagination import Cursor
 from app.config import get_settings
+from app.metrics import timed_db
+from app.services import background, memory_index
+from app.services.tokenizer import estimate_message_tokens, estimate_tokens, truncate_to_tokens, MESSAGE_OVERHEAD_TOKENS
 
 settings = get_settings()
 
@@ -26,89 +34,125 @@ MEMORY_TRIGGERS = [
 ]
 
 
-def get_short_term_memory(db: Session, session_id: str) -> list[dict]:
+# Rows fetched per round trip while packing the short-term window
+_HISTORY_PAGE_SIZE = 25
+
+
+@timed_db
+async def get_short_term_memory(
+    db: AsyncSession, session_id: str, token_budget: int
+) -> tuple[list[dict], Cursor | None]:
     """
-    Retrieve the last N messages from the current chat session
-    to use as conversation context.
+    Retrieve the most recent messages from the current chat session that
+    fit in `token_budget` tokens, to use as conversation context.
+
+    Messages are packed newest-first and fetched a page at a time, so a
+    session with one huge pasted document doesn't load its whole history.
+    The newest message is always included, truncated if it alone is over
+    budget.
+
+    Messages with an image also carry its "image_url". Of several replies
+    to one message (fan-out siblings) only the newest is included.
+
+    Returns (messages oldest first, left_out). left_out is the position
+    (created_at, id) of the newest message that didn't fit (everything up
+    to it is for the summary), or None when the whole session fit.
     """
-    messages = (
-        db.query(Message)
-        .filter(Message.session_id == session_id)
-        .order_by(Message.created_at.desc())
-        .limit(settings.MEMORY_WINDOW)
-        .all()
-    )
+    packed: list[dict] = []
+    answered: set[str] = set()  # user messages whose (newest) reply is already packed
+    remaining = token_budget
+    before = None
+    full = False  # the next message seen is the first one left out
+    left_out = None
+    exhausted = False
+    while left_out is None and not exhausted:
+        query = (
+            select(
+                Message.role, Message.content, Message.image_url, Message.parent_id, Message.created_at, Message.id
+            )
+            .where(Message.session_id == session_id)
+        )
+        # Keyset on (created_at, id), so messages sharing a timestamp at a
+        # page boundary are neither skipped nor repeated
+        if before is not None:
+            query = query.where(tuple_(Message.created_at, Message.id) < tuple_(before.timestamp, before.id))
+        page = (await db.execute(
+            query.order_by(Message.created_at.desc(), Message.id.desc()).limit(_HISTORY_PAGE_SIZE)
+        )).all()
+        exhausted = len(page) < _HISTORY_PAGE_SIZE
+
+        for role, content, image_url, parent_id, created_at, message_id in page:
+            before = Cursor(created_at, message_id)
+            if full:
+                left_out = before
+                break
+            # A fan-out turn has one reply per model; the context keeps only
+            # the newest, so the model sees a single conversation
+            if role == "assistant" and parent_id:
+                if parent_id in answered:
+                    continue
+                answered.add(parent_id)
+            message = {"role": role, "content": content}
+            cost = estimate_message_tokens(message)
+            if image_url:
+                message["image_url"] = image_url
+            if cost > remaining or len(packed) >= settings.MEMORY_WINDOW:
+                if packed:
+                    left_out = before
+                    break
+                message["content"] = truncate_to_tokens(content, max(remaining - MESSAGE_OVERHEAD_TOKENS, 0))
+                packed.append(message)
+                full = True
+                continue
+            packed.append(message)
+            remaining -= cost
+
     # Reverse so oldest first
-    messages.reverse()
-    return [{"role": m.role, "content": m.content} for m in messages]
+    packed.reverse()
+    return packed, left_out
 
 
-def get_long_term_memory(db: Session, user_id: str) -> list[dict]:
+@timed_db
+async def get_long_term_memory(db: AsyncSession, user_id: str, query: str | None = None) -> list[dict]:
     """
-    Retrieve all stored long-term memories for a user.
-    Returns list of key-value pairs that can be injected into system prompt.
+    Retrieve long-term memories for a user to inject into the system prompt.
+    With a query, returns the MEMORY_TOP_K memories most relevant to it
+    (topped up with the most recent); without one, the MEMORY_TOP_K most recent.
     """
-    memories = (
-        db.query(MemoryStore)
-        .filter(MemoryStore.user_id == user_id)
+    if query:
+        return await memory_index.search(db, user_id, query, settings.MEMORY_TOP_K)
+    memories = await db.scalars(
+        select(MemoryStore)
+        .where(MemoryStore.user_id == user_id)
         .order_by(MemoryStore.created_at.desc())
-        .limit(50)  # cap at 50 to avoid overloading context
-        .all()
+        .limit(settings.MEMORY_TOP_K)
     )
     return [{"key": m.key, "value": m.value, "category": m.category} for m in memories]
 
 
-def format_memory_context(memories: list[dict]) -> str:
-    """Format long-term memories into a string for the system prompt."""
+def format_memory_context(memories: list[dict], token_budget: int | None = None) -> str:
+    """
+    Format long-term memories into a string for the system prompt.
+    With a token_budget, memories that don't fit are left out.
+    """
     if not memories:
         return ""
-    lines = ["Here are some things you know about this user:"]
+    header = "Here are some things you know about this user:"
+    lines = [header]
+    remaining = token_budget - estimate_tokens(header) if token_budget is not None else None
     for m in memories:
-        lines.append(f"- {m['key']}: {m['value']}")
+        line = f"- {m['key']}: {m['value']}"
+        if remaining is not None:
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            remaining -= cost
+        lines.append(line)
+    if len(lines) == 1:
+        return ""
     return "\n".join(lines)
 
 
-def extract_and_store_memories(db: Session, user_id: str, user_message: str):
-    """
-    Parse user message for memorable facts and store them in long-term memory.
-    Uses simple regex pattern matching.
-    """
-    text = user_message.strip().lower()
-
-    for pattern in MEMORY_TRIGGERS:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            groups = match.groups()
-            if len(groups) == 2:
-                key = f"favorite {groups[0]}"
-                value = groups[1].strip().rstrip(".")
-            else:
-                key = _extract_key(pattern)
-                value = groups[0].strip().rstrip(".")
-
-            # Avoid duplicates
-            existing = (
-                db.query(MemoryStore)
-                .filter(
-                    MemoryStore.user_id == user_id,
-                    MemoryStore.key == key,
-                )
-                .first()
-            )
-            if existing:
-                existing.value = value
-            else:
-                memory = MemoryStore(
-                    user_id=user_id,
-                    key=key,
-                    value=value,
-                    category="auto-extracted",
-                )
-                db.add(memory)
-
-    db.commit()
-
-
 def _extract_key(pattern: str) -> str:
     """Derive a memory key name from the regex pattern."""
     key_map = {
@@ -124,16 +168,115 @@ def _extract_key(pattern: str) -> str:
     return key_map.get(pattern, "fact")
 
 
-def save_memory(db: Session, user_id: str, key: str, value: str, category: str = "manual"):
+# Compiled once at import. The combined pattern rejects messages with no
+# trigger phrase in a single scan — most messages stop there; only the ones
+# that pass are checked against each pattern.
+_ANY_TRIGGER = re.compile("|".join(f"(?:{p})" for p in MEMORY_TRIGGERS), re.IGNORECASE)
+_TRIGGERS = [(re.compile(p, re.IGNORECASE), _extract_key(p)) for p in MEMORY_TRIGGERS]
+
+
+def extract_memories(user_message: str) -> dict[str, str]:
+    """
+    Parse a user message for memorable facts using simple regex pattern
+    matching. Returns {key: value}.
+    """
+    text = user_message.strip().lower()
+    if not _ANY_TRIGGER.search(text):
+        return {}
+
+    facts = {}
+    for pattern, key in _TRIGGERS:
+        match = pattern.search(text)
+        if match:
+            groups = match.groups()
+            if len(groups) == 2:
+                facts[f"favorite {groups[0]}"] = groups[1].strip().rstrip(".")
+            else:
+                facts[key] = groups[0].strip().rstrip(".")
+    return facts
+
+
+@timed_db
+async def store_memories(db: AsyncSession, facts: dict[tuple[str, str], str]):
+    """
+    Upsert auto-extracted facts, {(user_id, key): value}, in one transaction:
+    one query for the existing rows, then a single commit.
+    """
+    if not facts:
+        return
+    user_ids = {user_id for user_id, _ in facts}
+    keys = {key for _, key in facts}
+    existing_rows = await db.scalars(
+        select(MemoryStore).where(MemoryStore.user_id.in_(user_ids), MemoryStore.key.in_(keys))
+    )
+    existing = {}
+    for row in existing_rows:
+        existing.setdefault((row.user_id, row.key), row)
+
+    saved = []
+    for (user_id, key), value in facts.items():
+        row = existing.get((user_id, key))
+        if row:
+            row.value = value
+        else:
+            row = MemoryStore(user_id=user_id, key=key, value=value, category="auto-extracted")
+            db.add(row)
+        saved.append(row)
+    await db.commit()
+    for row in saved:
+        memory_index.on_saved(row.user_id, row)
+
+
+async def _store_extraction_batch(items: list[tuple[str, str]]):
+    """BatchQueue handler: extract facts from a batch of (user_id, message) and upsert them together."""
+    facts = {}
+    for user_id, user_message in items:
+        for key, value in extract_memories(user_message).items():
+            facts[(user_id, key)] = value
+    if facts:
+        async with SessionLocal() as db:
+            await store_memories(db, facts)
+
+
+_extraction_queue = background.BatchQueue(
+    "memory_extraction",
+    _store_extraction_batch,
+    max_batch=settings.MEMORY_BATCH_SIZE,
+    max_delay=settings.MEMORY_BATCH_DELAY,
+    max_size=settings.BACKGROUND_QUEUE_SIZE,
+)
+
+
+def queue_memory_extraction(user_id: str, user_message: str):
+    """Extract and store memories from a user message in the background."""
+    _extraction_queue.submit((user_id, user_message))
+
+
+@timed_db
+async def list_memories(db: AsyncSession, user_id: str) -> list[MemoryStore]:
+    """Get every stored memory for a user, newest first."""
+    result = await db.scalars(
+        select(MemoryStore)
+        .where(MemoryStore.user_id == user_id)
+        .order_by(MemoryStore.created_at.desc())
+    )
+    return list(result)
+
+
+@timed_db
+async def save_memory(db: AsyncSession, user_id: str, key: str, value: str, category: str = "manual"):
     """Manually save a memory for a user."""
     memory = MemoryStore(user_id=user_id, key=key, value=value, category=category)
     db.add(memory)
-    db.commit()
-    db.refresh(memory)
+    await db.commit()
+    await db.refresh(memory)
+    memory_index.on_saved(user_id, memory)
     return memory
 
 
-def delete_user_memories(db: Session, user_id: str):
+@timed_db
+async def delete_user_memories(db: AsyncSession, user_id: str):
     """Delete all memories for a user."""
-    db.query(MemoryStore).filter(MemoryStore.user_id == user_id).delete()
-    db.commit()
+    await db.execute(delete(MemoryStore).where(MemoryStore.user_id == user_id))
+    await db.commit()
+    memory_index.on_cleared(user_id)
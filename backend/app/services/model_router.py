@@ -5,23 +5,38 @@ To add a new model for competition:
 1. Add it to AVAILABLE_MODELS dict below
 2. Set DEFAULT_MODEL in .env
 That's it!
+
+Each request goes to the chosen model, then to the models listed for it
+in MODEL_FALLBACKS if it fails, skipping providers whose circuit breaker
+is open; with HEDGE_ENABLED a slow request is also raced against the
+next candidate (see resilience.py). Calls to each provider are limited,
+queued and retried on 429 by admission.py. Identical concurrent requests
+to models in COALESCE_MODELS share one upstream call (coalesce.py).
 """
 
 import base64
 import httpx
 import json
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, TypeVar
 from openai import AsyncOpenAI
 from app.config import get_settings
+from app import metrics, tracing
+from app.services import admission, coalesce, resilience, response_cache
 
 settings = get_settings()
 
+T = TypeVar("T")
+
 # ── Available Models Registry ──
 # Base models always available
+# context_window: total tokens (prompt + completion) the model accepts
 BASE_MODELS = {
-    "gpt-4o": {"provider": "openai", "model_id": "gpt-4o", "vision": True},
-    "gpt-4o-mini": {"provider": "openai", "model_id": "gpt-4o-mini", "vision": True},
-    "deepseek-chat": {"provider": "deepseek", "model_id": "deepseek-chat", "vision": False},
-    "deepseek-reasoner": {"provider": "deepseek", "model_id": "deepseek-reasoner", "vision": False},
+    "gpt-4o": {"provider": "openai", "model_id": "gpt-4o", "vision": True, "context_window": 128000},
+    "gpt-4o-mini": {"provider": "openai", "model_id": "gpt-4o-mini", "vision": True, "context_window": 128000},
+    "deepseek-chat": {"provider": "deepseek", "model_id": "deepseek-chat", "vision": False, "context_window": 64000},
+    "deepseek-reasoner": {"provider": "deepseek", "model_id": "deepseek-reasoner", "vision": False, "context_window": 64000},
 }
 
 def get_full_registry() -> dict:
@@ -36,14 +51,16 @@ def get_full_registry() -> dict:
             registry[model_id] = {
                 "provider": provider_type,
                 "model_id": model_id,
-                "vision": True
+                "vision": True,
+                "context_window": settings.COMPETITION_CONTEXT_WINDOW,
             }
     elif settings.COMPETITION_BASE_URL:
         # Fallback to single generic model if no IDs are provided but URL is
         registry["competition-model"] = {
             "provider": "competition",
             "model_id": "custom",
-            "vision": True
+            "vision": True,
+            "context_window": settings.COMPETITION_CONTEXT_WINDOW,
         }
         
     return registry
@@ -58,43 +75,142 @@ def get_available_models() -> list[dict]:
     ]
 
 
-def _get_client(provider: str) -> AsyncOpenAI:
-    """Get the appropriate OpenAI-compatible client for a provider."""
+def get_context_window(model_name: str | None = None) -> int:
+    """Context window (in tokens) of a model; unknown models get COMPETITION_CONTEXT_WINDOW."""
+    model_info = get_full_registry().get(model_name or settings.DEFAULT_MODEL, {})
+    return model_info.get("context_window", settings.COMPETITION_CONTEXT_WINDOW)
+
+
+# ── Shared clients ──
+# One pooled httpx client for all upstream traffic and one AsyncOpenAI client
+# per provider on top of it. Created in main.lifespan via init_clients() and
+# closed via close_clients(); created lazily if used outside the app.
+_http_client: httpx.AsyncClient | None = None
+_clients: dict[str, AsyncOpenAI] = {}
+
+
+def _provider_config(provider: str) -> tuple[str, str]:
+    """Return (api_key, base_url) for an OpenAI-compatible provider."""
     if provider == "openai":
-        return AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_BASE_URL,
-            http_client=httpx.AsyncClient(verify=settings.SSL_VERIFY)
-        )
+        return settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL
     elif provider == "deepseek":
-        return AsyncOpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL,
-            http_client=httpx.AsyncClient(verify=settings.SSL_VERIFY)
-        )
+        return settings.DEEPSEEK_API_KEY, settings.DEEPSEEK_BASE_URL
     elif provider == "competition":
-        return AsyncOpenAI(
-            api_key=settings.COMPETITION_API_KEY,
-            base_url=settings.COMPETITION_BASE_URL,
-            http_client=httpx.AsyncClient(verify=settings.SSL_VERIFY)
-        )
+        return settings.COMPETITION_API_KEY, settings.COMPETITION_BASE_URL
     else:
         raise ValueError(f"Unknown provider: {provider}")
 
 
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the shared, pooled httpx client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            verify=settings.SSL_VERIFY,
+            http2=settings.HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        )
+        _clients.clear()
+    return _http_client
+
+
+def _get_client(provider: str) -> AsyncOpenAI:
+    """Get the shared OpenAI-compatible client for a provider."""
+    http_client = _get_http_client()
+    client = _clients.get(provider)
+    if client is None:
+        api_key, base_url = _provider_config(provider)
+        # Retries are done by admission.run, which honors Retry-After and frees the slot meanwhile
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        _clients[provider] = client
+    return client
+
+
+async def init_clients():
+    """Create the shared provider clients. Called on app startup."""
+    _get_http_client()
+    for provider in ("openai", "deepseek", "competition"):
+        api_key, base_url = _provider_config(provider)
+        if api_key and base_url:
+            _get_client(provider)
+
+
+async def close_clients():
+    """Close the shared connection pool. Called on app shutdown."""
+    global _http_client
+    _clients.clear()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _sampling_params(model_info: dict) -> dict:
+    """Sampling parameters sent with every completion request for this model."""
+    return {
+        "max_tokens": settings.LLM_MAX_TOKENS,
+        "temperature": model_info.get("temperature", settings.LLM_TEMPERATURE),
+    }
+
+
+def _cache_key(
+    model_name: str, model_info: dict, messages: list[dict], params: dict, image_base64: str | None
+) -> str | None:
+    """Response-cache key for this request, or None if it must not be cached."""
+    cache = response_cache.get_cache()
+    if cache is None:
+        return None
+    if (
+        _has_images(messages, image_base64)
+        or cache.ttl_for(model_name) <= 0
+        or (params["temperature"] != 0 and not settings.RESPONSE_CACHE_NONZERO_TEMPERATURE)
+    ):
+        cache.bypass()
+        return None
+    return response_cache.request_key(model_name, model_info["model_id"], messages, params)
+
+
+def _coalesce_key(
+    kind: str, model_name: str, model_info: dict, messages: list[dict], params: dict, image_base64: str | None
+) -> str | None:
+    """Key under which identical in-flight requests share one upstream call, or None if this one mustn't."""
+    if _has_images(messages, image_base64) or not coalesce.enabled_for(model_name):
+        return None
+    return f"{kind}:" + response_cache.request_key(model_name, model_info["model_id"], messages, params)
+
+
+def _has_images(messages: list[dict], image_base64: str | None) -> bool:
+    return bool(image_base64) or any(m.get("image") for m in messages)
+
+
 def _build_messages(messages: list[dict], image_base64: str | None = None) -> list[dict]:
     """
     Build the message list for the API call.
-    If image_base64 is provided, attach it to the last user message as a vision input.
+    A message may carry an "image" (a data: URL, see image_store), sent
+    with it as a vision input. If image_base64 is provided, it is attached
+    to the last user message.
     """
     formatted = []
     for msg in messages:
-        formatted.append({"role": msg["role"], "content": msg["content"]})
+        if msg.get("image"):
+            formatted.append({
+                "role": msg["role"],
+                "content": [
+                    {"type": "text", "text": msg["content"]},
+                    {"type": "image_url", "image_url": {"url": msg["image"]}},
+                ],
+            })
+        else:
+            formatted.append({"role": msg["role"], "content": msg["content"]})
 
     # Attach image to the last user message if provided
     if image_base64 and formatted:
         last_msg = formatted[-1]
-        if last_msg["role"] == "user":
+        if last_msg["role"] == "user" and isinstance(last_msg["content"], str):
             formatted[-1] = {
                 "role": "user",
                 "content": [
@@ -110,6 +226,174 @@ def _build_messages(messages: list[dict], image_base64: str | None = None) -> li
     return formatted
 
 
+class ModelError(Exception):
+    """A model could not produce a response (unknown model, no API key, provider failure)."""
+
+
+def _has_api_key(provider: str) -> bool:
+    """Whether real calls can be made to a provider (otherwise we run in demo/echo mode)."""
+    if provider == "openai":
+        return bool(settings.OPENAI_API_KEY)
+    if provider == "deepseek":
+        return bool(settings.DEEPSEEK_API_KEY)
+    return True
+
+
+def is_available(model_name: str) -> bool:
+    """Whether `model_name` is registered and has credentials configured."""
+    model_info = get_full_registry().get(model_name)
+    return model_info is not None and _has_api_key(model_info["provider"])
+
+
+def _candidates(model_name: str, needs_vision: bool) -> list[tuple[str, str]]:
+    """
+    (model, provider) pairs to try for a request: the requested model, then
+    its MODEL_FALLBACKS that are registered, have credentials and (when
+    images are attached) support vision. With hedging on and no fallbacks,
+    the model is raced against itself.
+    """
+    registry = get_full_registry()
+    candidates = [(model_name, registry[model_name]["provider"])]
+    for name in settings.MODEL_FALLBACKS.get(model_name, []):
+        info = registry.get(name)
+        if name == model_name or info is None or not _has_api_key(info["provider"]):
+            continue
+        if needs_vision and not info["vision"]:
+            continue
+        candidates.append((name, info["provider"]))
+    if settings.HEDGE_ENABLED and len(candidates) == 1:
+        candidates.append(candidates[0])
+    return candidates
+
+
+def _chain_error(model_name: str, failure: resilience.ChainFailed) -> str:
+    """User-facing message for a request that no candidate could serve."""
+    if not failure.errors:
+        return f"Error communicating with {model_name}: provider temporarily unavailable, please retry shortly"
+    if len(failure.errors) == 1:
+        name, error = failure.errors[0]
+        return f"Error communicating with {name}: {str(error)}"
+    details = "; ".join(f"{name}: {error}" for name, error in failure.errors)
+    return f"Error communicating with {model_name} and its fallbacks: {details}"
+
+
+async def _call_model(model_info: dict, messages: list[dict], image_base64: str | None, params: dict) -> str:
+    """One non-streaming request to one provider, under its admission limit."""
+    provider, model_id = model_info["provider"], model_info["model_id"]
+    if provider == "competition_raw":
+        return await admission.run(
+            provider, lambda: _measured(provider, model_id, _get_raw_http_response(messages, model_id, image_base64))
+        )
+
+    async def request() -> str:
+        response = await _measured(provider, model_id, _get_client(provider).chat.completions.create(
+            model=model_id,
+            messages=_build_messages(messages, image_base64),
+            **params,
+        ))
+        metrics.record_usage(provider, model_id, response.usage)
+        return response.choices[0].message.content or ""
+
+    return await admission.run(provider, request)
+
+
+async def _measured(provider: str, model_id: str, call: Awaitable[T]) -> T:
+    """Await one non-streaming upstream call, recording its latency, outcome and span."""
+    start = time.perf_counter()
+    try:
+        with tracing.span("llm.request", provider=provider, model=model_id, mode="complete"):
+            result = await call
+    except Exception:
+        metrics.llm_requests.labels(provider, model_id, "error").inc()
+        raise
+    metrics.llm_request_duration.labels(provider, model_id, "complete").observe(time.perf_counter() - start)
+    metrics.llm_requests.labels(provider, model_id, "ok").inc()
+    return result
+
+
+async def complete(
+    messages: list[dict],
+    model_name: str | None = None,
+    image_base64: str | None = None,
+    max_tokens: int | None = None,
+    failover: bool = True,
+) -> str:
+    """
+    Send messages to the selected AI model and return the response text,
+    failing over to its MODEL_FALLBACKS (unless failover=False, for callers
+    that need this model's answer specifically, e.g. model comparisons).
+
+    Unlike get_ai_response this raises ModelError instead of returning
+    error or demo-echo text, for internal callers (e.g. summaries) that
+    must not mistake an error message for model output.
+    """
+    model_name = model_name or settings.DEFAULT_MODEL
+    registry = get_full_registry()
+    model_info = registry.get(model_name)
+
+    if not model_info:
+        raise ModelError(f"Error: Unknown model '{model_name}'. Available: {list(registry.keys())}")
+
+    provider = model_info["provider"]
+    if not _has_api_key(provider):
+        raise ModelError(f"No API key configured for {model_name}")
+
+    params = _sampling_params(model_info)
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    cache_key = _cache_key(model_name, model_info, messages, params, image_base64)
+    if cache_key:
+        cached = await response_cache.get_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+    async def fetch() -> str:
+        return await _complete_upstream(model_name, messages, image_base64, max_tokens, cache_key, failover)
+
+    coalesce_key = _coalesce_key("complete" if failover else "complete-pinned", model_name, model_info, messages, params, image_base64)
+    if coalesce_key:
+        return await coalesce.call(coalesce_key, fetch)
+    return await fetch()
+
+
+async def _complete_upstream(
+    model_name: str,
+    messages: list[dict],
+    image_base64: str | None,
+    max_tokens: int | None,
+    cache_key: str | None,
+    failover: bool = True,
+) -> str:
+    """The upstream part of complete(): call the model (or its fallbacks) and cache the answer."""
+    registry = get_full_registry()
+
+    async def attempt(name: str) -> str:
+        info = registry[name]
+        attempt_params = _sampling_params(info)
+        if max_tokens is not None:
+            attempt_params["max_tokens"] = max_tokens
+        return await resilience.guarded(
+            info["provider"], name, lambda: _call_model(info, messages, image_base64, attempt_params)
+        )
+
+    candidates = _candidates(model_name, _has_images(messages, image_base64))
+    if not failover:
+        candidates = [c for c in candidates if c[0] == model_name]
+    try:
+        text, served_by = await resilience.race(
+            candidates,
+            attempt,
+            resilience.hedge_delay(model_name),
+        )
+    except resilience.ChainFailed as e:
+        raise ModelError(_chain_error(model_name, e)) from e
+
+    # A fallback's answer isn't what was asked for, so don't cache it as this model's
+    if cache_key and served_by == model_name:
+        await response_cache.get_cache().set(cache_key, model_name, text)
+    return text
+
+
 async def get_ai_response(
     messages: list[dict],
     model_name: str | None = None,
@@ -124,40 +408,220 @@ async def get_ai_response(
         image_base64: Optional base64-encoded image for vision models
 
     Returns:
-        The assistant's response text.
+        The assistant's response text. Errors are returned as text, and a
+        demo echo is returned when the provider has no API key.
+    """
+    model_name = model_name or settings.DEFAULT_MODEL
+    model_info = get_full_registry().get(model_name)
+
+    # Check if API key is configured
+    if model_info and not _has_api_key(model_info["provider"]):
+        return _echo_response(messages, model_name)
+
+    try:
+        return await complete(messages, model_name, image_base64)
+    except ModelError as e:
+        return str(e)
+
+
+async def stream_ai_response(
+    messages: list[dict],
+    model_name: str | None = None,
+    image_base64: str | None = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of get_ai_response: yields the response text in
+    chunks as the provider produces them.
+
+    Providers without streaming support (raw HTTP, demo echo) yield
+    their whole response as a single chunk. Errors are yielded as text,
+    the same way get_ai_response returns them.
     """
     model_name = model_name or settings.DEFAULT_MODEL
     registry = get_full_registry()
     model_info = registry.get(model_name)
-    
+
     if not model_info:
-        return f"Error: Unknown model '{model_name}'. Available: {list(registry.keys())}"
+        yield f"Error: Unknown model '{model_name}'. Available: {list(registry.keys())}"
+        return
 
     provider = model_info["provider"]
 
-    # Check if API key is configured
-    if provider == "openai" and not settings.OPENAI_API_KEY:
-        return _echo_response(messages, model_name)
-    if provider == "deepseek" and not settings.DEEPSEEK_API_KEY:
-        return _echo_response(messages, model_name)
+    if not _has_api_key(provider):
+        yield _echo_response(messages, model_name)
+        return
+
+    params = _sampling_params(model_info)
+    cache_key = _cache_key(model_name, model_info, messages, params, image_base64)
+    if cache_key:
+        cached = await response_cache.get_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    coalesce_key = _coalesce_key("stream", model_name, model_info, messages, params, image_base64)
+    if coalesce_key:
+        chunks = coalesce.stream(
+            coalesce_key, lambda: _stream_upstream(model_name, messages, image_base64, cache_key)
+        )
+    else:
+        chunks = _stream_upstream(model_name, messages, image_base64, cache_key)
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield chunk
+
+
+async def _stream_upstream(
+    model_name: str, messages: list[dict], image_base64: str | None, cache_key: str | None
+) -> AsyncIterator[str]:
+    """The upstream part of stream_ai_response(): stream from the model (or its fallbacks) and cache the answer."""
+    registry = get_full_registry()
+
+    # Failover and hedging apply up to the first chunk; after that we're
+    # committed to the provider that produced it.
+    async def attempt(name: str) -> tuple[str, object]:
+        info = registry[name]
+        return await resilience.guarded(
+            info["provider"], f"{name}:ttft", lambda: _open_stream(info, messages, image_base64)
+        )
 
     try:
-        if provider == "competition_raw":
-            return await _get_raw_http_response(messages, model_info["model_id"], image_base64)
-            
-        client = _get_client(provider)
-        formatted_messages = _build_messages(messages, image_base64)
-
-        response = await client.chat.completions.create(
-            model=model_info["model_id"],
-            messages=formatted_messages,
-            max_tokens=4096,
-            temperature=0.7,
+        (first, stream), served_by = await resilience.race(
+            _candidates(model_name, _has_images(messages, image_base64)),
+            attempt,
+            resilience.hedge_delay(f"{model_name}:ttft"),
+            discard=_close_stream,
         )
-        return response.choices[0].message.content or ""
+    except resilience.ChainFailed as e:
+        yield _chain_error(model_name, e)
+        return
+
+    parts = [first]
+    # Closed on every exit, including a consumer that goes away after the
+    # first chunk: the stream holds an admission slot until then
+    try:
+        if first:
+            yield first
+        if stream is not None:
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except Exception as e:
+                resilience.get_breaker(registry[served_by]["provider"]).record_failure()
+                yield f"Error communicating with {served_by}: {str(e)}"
+                return
+    finally:
+        if stream is not None:
+            await stream.close()
 
-    except Exception as e:
-        return f"Error communicating with {model_name}: {str(e)}"
+    if cache_key and served_by == model_name:
+        await response_cache.get_cache().set(cache_key, model_name, "".join(parts))
+
+
+async def _open_stream(model_info: dict, messages: list[dict], image_base64: str | None) -> tuple[str, object]:
+    """
+    Start a streaming request and wait for its first content chunk.
+    Returns (first chunk, open stream to read the rest from); providers
+    without streaming (raw HTTP) return (whole response, None). The
+    stream holds an admission slot until it is closed.
+    """
+    provider, model_id = model_info["provider"], model_info["model_id"]
+    if provider == "competition_raw":
+        text = await admission.run(
+            provider, lambda: _measured(provider, model_id, _get_raw_http_response(messages, model_id, image_base64))
+        )
+        return text, None
+
+    extra = {}
+    if provider in settings.STREAM_USAGE_PROVIDERS:
+        extra["stream_options"] = {"include_usage": True}
+
+    async def start() -> tuple[str, object]:
+        started = time.perf_counter()
+        # Ended when the stream is, so it isn't made current
+        trace_span = tracing.span("llm.request", provider=provider, model=model_id, mode="stream")
+        try:
+            stream = await _get_client(provider).chat.completions.create(
+                model=model_id,
+                messages=_build_messages(messages, image_base64),
+                stream=True,
+                **_sampling_params(model_info),
+                **extra,
+            )
+        except BaseException as e:
+            if isinstance(e, Exception):
+                metrics.llm_requests.labels(provider, model_id, "error").inc()
+            trace_span.end(e)
+            raise
+        try:
+            while True:
+                try:
+                    chunk = await anext(stream)
+                except StopAsyncIteration:
+                    return "", _AdmittedStream(stream, provider, model_id, started, trace_span)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    ttft = time.perf_counter() - started
+                    metrics.llm_time_to_first_token.labels(provider, model_id).observe(ttft)
+                    trace_span.set("ttft_ms", round(ttft * 1000, 1))
+                    return chunk.choices[0].delta.content, _AdmittedStream(stream, provider, model_id, started, trace_span)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                metrics.llm_requests.labels(provider, model_id, "error").inc()
+            trace_span.end(e)
+            await stream.close()
+            raise
+
+    return await admission.run(provider, start, hold=True)
+
+
+class _AdmittedStream:
+    """
+    An open upstream stream: records its usage, latency, outcome and span,
+    and gives its provider's admission slot back when closed.
+    """
+
+    def __init__(self, stream, provider: str, model_id: str, started: float, trace_span):
+        self._stream = stream
+        self._provider: str | None = provider
+        self._labels = (provider, model_id)
+        self._started = started
+        self._trace_span = trace_span
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                if chunk.usage is not None:
+                    metrics.record_usage(*self._labels, chunk.usage)
+                    self._trace_span.set("completion_tokens", chunk.usage.completion_tokens)
+                yield chunk
+        except Exception as e:
+            metrics.llm_requests.labels(*self._labels, "error").inc()
+            self._trace_span.end(e)
+            raise
+        metrics.llm_request_duration.labels(*self._labels, "stream").observe(time.perf_counter() - self._started)
+        metrics.llm_requests.labels(*self._labels, "ok").inc()
+
+    async def close(self):
+        if self._provider is None:
+            return
+        provider, self._provider = self._provider, None
+        self._trace_span.end()
+        try:
+            await self._stream.close()
+        finally:
+            admission.release(provider)
+
+
+async def _close_stream(opened: tuple[str, object]):
+    """Close a stream that lost a hedge race."""
+    _, stream = opened
+    if stream is not None:
+        await stream.close()
 
 
 async def _get_raw_http_response(messages: list[dict], model_id: str, image_base64: str | None = None) -> str:
@@ -177,15 +641,15 @@ async def _get_raw_http_response(messages: list[dict], model_id: str, image_base
         "model": model_id,
         "prompt": messages[-1]["content"], # Just the last message
         "system_prompt": settings.SYSTEM_PROMPT,
-        "temperature": 0.7,
+        "temperature": settings.LLM_TEMPERATURE,
         # "image": image_base64 # Uncomment if they want base64 image
     }
 
-    async with httpx.AsyncClient(verify=settings.SSL_VERIFY) as client:
-        response = await client.post(url, json=payload, headers=headers, timeout=30.0)
-        response.raise_for_status()
-        data = response.json()
-        
+    client = _get_http_client()
+    response = await client.post(url, json=payload, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+
     # ── CUSTOMIZE THIS EXTRACTION ──
     # Check if the text is in 'response', 'text', or 'choices'
     if isinstance(data, dict):
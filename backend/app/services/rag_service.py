@@ -0,0 +1,224 @@
+"""
+RAG Service — Documents attached to a chat session, retrieved by relevance.
+
+An uploaded document is extracted (document_service), split into
+overlapping chunks of about RAG_CHUNK_TOKENS and stored as DocumentChunk
+rows. On each chat turn only the RAG_TOP_K chunks that best match the
+user's message are put in the system prompt, instead of the whole
+document riding along in the history on every turn.
+
+Chunks are ranked with a per-session BM25Index (search_index), built
+from the DB on first use and updated in place when a document is
+attached. Indexes for the RAG_INDEX_MAX_SESSIONS most recently used
+sessions are kept; each is rebuilt after RAG_INDEX_TTL seconds so
+documents attached through other workers are picked up.
+"""
+
+import time
+from collections import OrderedDict
+from typing import AsyncIterator
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.models import Document, DocumentChunk
+from app.metrics import timed_db
+from app.services import document_service
+from app.services.search_index import BM25Index
+from app.services.tokenizer import estimate_tokens
+
+settings = get_settings()
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int) -> list[str]:
+    """
+    Split text into chunks of about max_tokens, on line boundaries where
+    possible. Each chunk repeats up to overlap_tokens of trailing lines from
+    the previous one, so a passage cut at a boundary is still found whole.
+
+    Runs in the document process pool, so it must stay module-level.
+    """
+    chunks = []
+    current: list[tuple[str, int]] = []
+    size = 0
+    for piece, cost in _pieces(text, max_tokens):
+        if current and size + cost > max_tokens:
+            chunks.append("\n".join(p for p, _ in current))
+            carried: list[tuple[str, int]] = []
+            carried_size = 0
+            for p, c in reversed(current):
+                if carried_size + c > overlap_tokens:
+                    break
+                carried.insert(0, (p, c))
+                carried_size += c
+            current, size = carried, carried_size
+        current.append((piece, cost))
+        size += cost
+    if current:
+        chunks.append("\n".join(p for p, _ in current))
+    return chunks
+
+
+def _pieces(text: str, max_tokens: int):
+    """Yield (line, tokens) for each non-empty line; over-long lines are split by words."""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        cost = estimate_tokens(line)
+        if cost <= max_tokens:
+            yield line, cost
+            continue
+        words: list[str] = []
+        words_cost = 0
+        for word in line.split():
+            word_cost = estimate_tokens(word)
+            if words and words_cost + word_cost > max_tokens:
+                yield " ".join(words), words_cost
+                words, words_cost = [], 0
+            words.append(word)
+            words_cost += word_cost
+        if words:
+            yield " ".join(words), words_cost
+
+
+# ── Per-session retrieval index ──
+
+class _SessionIndex:
+    def __init__(self):
+        self.index = BM25Index()
+        self.built_at = time.monotonic()
+
+
+_indexes: OrderedDict[str, _SessionIndex] = OrderedDict()
+
+
+async def _get_index(db: AsyncSession, session_id: str) -> _SessionIndex:
+    session_index = _indexes.get(session_id)
+    if session_index is not None and time.monotonic() - session_index.built_at < settings.RAG_INDEX_TTL:
+        _indexes.move_to_end(session_id)
+        return session_index
+
+    session_index = _SessionIndex()
+    rows = await db.execute(
+        select(DocumentChunk.id, DocumentChunk.content).where(DocumentChunk.session_id == session_id)
+    )
+    for chunk_id, content in rows:
+        session_index.index.add(chunk_id, content)
+    _indexes[session_id] = session_index
+    _indexes.move_to_end(session_id)
+    while len(_indexes) > settings.RAG_INDEX_MAX_SESSIONS:
+        _indexes.popitem(last=False)
+    return session_index
+
+
+@timed_db
+async def retrieve(db: AsyncSession, session_id: str, query: str) -> list[dict]:
+    """Return the RAG_TOP_K chunks most relevant to `query`, best first, as {"filename", "position", "content"}."""
+    session_index = await _get_index(db, session_id)
+    ranked = [chunk_id for chunk_id, _ in session_index.index.search(query, settings.RAG_TOP_K)]
+    if not ranked:
+        return []
+    rows = await db.execute(
+        select(DocumentChunk.id, DocumentChunk.position, DocumentChunk.content, Document.filename)
+        .join(Document, Document.id == DocumentChunk.document_id)
+        .where(DocumentChunk.id.in_(ranked))
+    )
+    by_id = {row.id: {"filename": row.filename, "position": row.position, "content": row.content} for row in rows}
+    return [by_id[chunk_id] for chunk_id in ranked if chunk_id in by_id]
+
+
+def format_document_context(chunks: list[dict], token_budget: int) -> str:
+    """Format retrieved chunks for the system prompt; chunks that don't fit the budget are left out."""
+    if not chunks:
+        return ""
+    header = "Relevant excerpts from documents attached to this conversation:"
+    lines = [header]
+    remaining = token_budget - estimate_tokens(header)
+    for chunk in chunks:
+        block = f"[{chunk['filename']}, part {chunk['position'] + 1}]\n{chunk['content']}"
+        cost = estimate_tokens(block) + 2
+        if cost > remaining:
+            continue
+        remaining -= cost
+        lines.append(block)
+    if len(lines) == 1:
+        return ""
+    return "\n\n".join(lines)
+
+
+# ── Attaching and removing documents ──
+
+async def attach_document(
+    db: AsyncSession, session_id: str, upload: document_service.SavedUpload
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Extract, chunk, store and index an upload for a session, yielding
+    document_service's ("progress", ...) events and finally ("document",
+    Document). Raises like document_service.iter_extraction.
+    """
+    text = ""
+    async for kind, payload in document_service.iter_extraction(upload):
+        if kind == "progress":
+            yield kind, payload
+        else:
+            text = payload
+
+    chunks = await document_service.run_in_pool(
+        chunk_text, text, settings.RAG_CHUNK_TOKENS, settings.RAG_CHUNK_OVERLAP_TOKENS
+    )
+    document = Document(
+        session_id=session_id,
+        filename=upload.filename,
+        sha256=upload.sha256,
+        size=upload.size,
+        chunk_count=len(chunks),
+    )
+    db.add(document)
+    await db.flush()
+    chunk_ids = []
+    if chunks:
+        chunk_ids = list(await db.scalars(
+            insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+            [
+                {"document_id": document.id, "session_id": session_id, "position": i, "content": chunk}
+                for i, chunk in enumerate(chunks)
+            ],
+        ))
+    await db.commit()
+
+    session_index = _indexes.get(session_id)
+    if session_index is not None:
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            session_index.index.add(chunk_id, chunk)
+    yield "document", document
+
+
+@timed_db
+async def list_documents(db: AsyncSession, session_id: str) -> list[Document]:
+    """Documents attached to a session, oldest first."""
+    result = await db.scalars(
+        select(Document).where(Document.session_id == session_id).order_by(Document.created_at.asc())
+    )
+    return list(result)
+
+
+@timed_db
+async def delete_document(db: AsyncSession, session_id: str, document_id: str) -> bool:
+    """Remove a document and its chunks from a session."""
+    document = await db.scalar(
+        select(Document).where(Document.id == document_id, Document.session_id == session_id)
+    )
+    if not document:
+        return False
+    await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+    await db.delete(document)
+    await db.commit()
+    _indexes.pop(session_id, None)
+    return True
+
+
+async def delete_session_documents(db: AsyncSession, session_id: str):
+    """Delete every document of a session. The caller commits."""
+    await db.execute(delete(DocumentChunk).where(DocumentChunk.session_id == session_id))
+    await db.execute(delete(Document).where(Document.session_id == session_id))
+    _indexes.pop(session_id, None)
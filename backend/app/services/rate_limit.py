@@ -0,0 +1,238 @@
+"""
+Rate Limit — Per-user token buckets on chat requests and estimated tokens.
+
+Each user has two buckets per limit scope: one for requests and one for
+tokens (the message's estimated tokens plus RATE_LIMIT_REPLY_TOKENS for
+the reply). A bucket holds up to a minute's worth and refills
+continuously, so short bursts are fine but the sustained rate is capped.
+A request is admitted only if both buckets can pay; otherwise it is
+rejected with a 429 and Retry-After.
+
+The scope is the most specific entry in RATE_LIMITS for the request: the
+model name, then its provider, else the RATE_LIMIT_* defaults. Models
+under a provider-level limit share its buckets.
+
+Buckets live in memory (an LRU of RATE_LIMIT_MAX_KEYS; a dropped bucket
+was idle and would have refilled anyway). With RATE_LIMIT_PATH they are
+kept in a SQLite file instead, so limits hold across every worker on the
+host. Either way a check is O(1).
+"""
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.config import get_settings
+from app.services import model_router
+from app.services.tokenizer import estimate_tokens
+
+settings = get_settings()
+
+
+@dataclass(frozen=True, slots=True)
+class Limit:
+    scope: str
+    requests_per_minute: int
+    tokens_per_minute: int
+
+
+class RateLimited(Exception):
+    """A request was over its limit; `retry_after` is seconds until it would fit."""
+
+    def __init__(self, limit: Limit, retry_after: float, remaining_requests: int, remaining_tokens: int):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.remaining_requests = remaining_requests
+        self.remaining_tokens = remaining_tokens
+        super().__init__(f"Rate limit exceeded for {limit.scope}, retry in {math.ceil(retry_after)}s")
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "Retry-After": str(math.ceil(self.retry_after)),
+            "X-RateLimit-Limit-Requests": str(self.limit.requests_per_minute),
+            "X-RateLimit-Remaining-Requests": str(self.remaining_requests),
+            "X-RateLimit-Limit-Tokens": str(self.limit.tokens_per_minute),
+            "X-RateLimit-Remaining-Tokens": str(self.remaining_tokens),
+        }
+
+
+def limit_for(model_name: str | None) -> Limit:
+    """The limit that applies to a request for `model_name`."""
+    model_name = model_name or settings.DEFAULT_MODEL
+    model_info = model_router.get_full_registry().get(model_name)
+    scopes = [model_name] + ([model_info["provider"]] if model_info else [])
+    for scope in scopes:
+        configured = settings.RATE_LIMITS.get(scope)
+        if configured is not None:
+            return Limit(
+                scope,
+                configured.get("requests_per_minute", settings.RATE_LIMIT_REQUESTS_PER_MINUTE),
+                configured.get("tokens_per_minute", settings.RATE_LIMIT_TOKENS_PER_MINUTE),
+            )
+    return Limit("default", settings.RATE_LIMIT_REQUESTS_PER_MINUTE, settings.RATE_LIMIT_TOKENS_PER_MINUTE)
+
+
+def _take(levels: list[float], updated_at: float, costs: list[tuple[int, int]], now: float):
+    """
+    Refill buckets at `levels` (last updated at `updated_at`) and pay
+    `costs` [(capacity per minute, cost)] if every bucket can. A capacity of
+    0 means unlimited. Returns (new levels, seconds to wait; 0 if paid).
+    """
+    refilled = []
+    wait = 0.0
+    for level, (capacity, cost) in zip(levels, costs):
+        if capacity <= 0:
+            refilled.append(level)
+            continue
+        rate = capacity / 60
+        level = min(capacity, level + (now - updated_at) * rate)
+        # An oversized request may still go through, on a full bucket
+        cost = min(cost, capacity)
+        if level < cost:
+            wait = max(wait, (cost - level) / rate)
+        refilled.append(level)
+    if wait == 0:
+        refilled = [
+            level - min(cost, capacity) if capacity > 0 else level
+            for level, (capacity, cost) in zip(refilled, costs)
+        ]
+    return refilled, wait
+
+
+class RateLimiter:
+    """Token buckets keyed "<user>:<scope>", in memory or in a shared SQLite file."""
+
+    def __init__(self, max_keys: int, path: str = ""):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[list[float], float]] = OrderedDict()  # key -> (levels, updated_at)
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self.counters = {"allowed": 0, "limited": 0}
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    async def check(self, user_id: str, charges: list[tuple[Limit, int]]):
+        """
+        Pay for requests of (limit, estimated tokens), all or nothing: if
+        any bucket can't pay, nothing is charged and RateLimited is raised
+        for the scope with the longest wait.
+        """
+        costs: dict[str, list[tuple[int, int]]] = {}  # key -> [(capacity, cost)] for requests, tokens
+        limits: dict[str, Limit] = {}
+        for limit, tokens in charges:
+            key = f"{user_id}:{limit.scope}"
+            requests, paid = (costs[key][0][1], costs[key][1][1]) if key in costs else (0, 0)
+            costs[key] = [(limit.requests_per_minute, requests + 1), (limit.tokens_per_minute, paid + tokens)]
+            limits[key] = limit
+        if self._db is not None:
+            results = await asyncio.to_thread(self._db_take, costs)
+        else:
+            results = self._memory_take(costs)
+        key, (levels, wait) = max(results.items(), key=lambda item: item[1][1])
+        if wait > 0:
+            self.counters["limited"] += 1
+            raise RateLimited(limits[key], wait, int(levels[0]), int(levels[1]))
+        self.counters["allowed"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "keys": len(self._buckets),
+            "shared": self._db is not None,
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def _memory_take(self, costs: dict[str, list[tuple[int, int]]]):
+        now = time.time()
+        results = {}
+        for key, key_costs in costs.items():
+            levels, updated_at = self._buckets.get(key) or ([capacity for capacity, _ in key_costs], now)
+            results[key] = _take(levels, updated_at, key_costs, now)
+        # Refilling is a function of time, so a rejected request leaves the buckets as they were
+        if all(wait == 0 for _, wait in results.values()):
+            for key, (levels, _) in results.items():
+                self._buckets[key] = (levels, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return results
+
+    def _db_take(self, costs: dict[str, list[tuple[int, int]]]):
+        with self._db_lock:
+            # IMMEDIATE takes the write lock up front, so the read-modify-write
+            # is atomic against other workers
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                results = {}
+                for key, key_costs in costs.items():
+                    row = self._db.execute(
+                        "SELECT requests, tokens, updated_at FROM rate_limits WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is None:
+                        levels, updated_at = [capacity for capacity, _ in key_costs], now
+                    else:
+                        levels, updated_at = [row[0], row[1]], row[2]
+                    results[key] = _take(levels, updated_at, key_costs, now)
+                if all(wait == 0 for _, wait in results.values()):
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO rate_limits (key, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                        [(key, levels[0], levels[1], now) for key, (levels, _) in results.items()],
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return results
+
+
+_limiter: RateLimiter | None = None
+
+
+def get_limiter() -> RateLimiter | None:
+    """The process-wide limiter, or None when RATE_LIMIT_ENABLED is off."""
+    global _limiter
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    if _limiter is None:
+        _limiter = RateLimiter(settings.RATE_LIMIT_MAX_KEYS, settings.RATE_LIMIT_PATH)
+    return _limiter
+
+
+async def check(user_id: str, model_names: list[str | None], content: str):
+    """
+    Charge a chat request to the user's buckets, once per model answering
+    it (several for a fan-out), all or nothing; raises RateLimited when
+    over the limit.
+    """
+    limiter = get_limiter()
+    if limiter is None:
+        return
+    tokens = estimate_tokens(content) + settings.RATE_LIMIT_REPLY_TOKENS
+    await limiter.check(user_id, [(limit_for(name), tokens) for name in model_names])
+
+
+def close_limiter():
+    """Close the shared store. Called on app shutdown."""
+    global _limiter
+    if _limiter is not None:
+        _limiter.close()
+        _limiter = None
+
+
+def stats() -> dict:
+    limiter = get_limiter()
+    return limiter.stats() if limiter else {"enabled": False}
@@ -0,0 +1,252 @@
+"""
+Resilience — Failover, circuit breaking and hedging for provider calls.
+
+- CircuitBreaker (per provider): after CIRCUIT_FAILURE_THRESHOLD
+  consecutive failures the provider is skipped for CIRCUIT_RESET_SECONDS,
+  then a single trial request decides whether it is healthy again
+- LatencyTracker (per model): rolling window of recent latencies; its
+  p95 is the hedge delay
+- race(): tries a chain of candidates (the requested model, then its
+  MODEL_FALLBACKS) in order. A failure moves on to the next candidate.
+  With hedging on, the next candidate is also started when the running
+  one is slower than the hedge delay. The first success wins and the
+  rest are cancelled.
+
+model_router builds the chains and wraps each provider call; everything
+here is provider-agnostic.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+from app.config import get_settings
+from app.services.admission import Overloaded
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class ChainFailed(Exception):
+    """
+    No candidate produced a result. `errors` holds (name, exception) for
+    each attempt made; it is empty when every candidate was skipped
+    because its provider's circuit is open.
+    """
+
+    def __init__(self, errors: list[tuple[str, Exception]], skipped: list[str]):
+        self.errors = errors
+        self.skipped = skipped
+        super().__init__("; ".join(f"{name}: {error}" for name, error in errors) or "circuit open")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial) -> closed."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. In half-open state only one trial is let through."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.counters["opened"] += 1
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def record_cancelled(self):
+        """A request was cancelled before finishing (e.g. lost a hedge race): no verdict."""
+        self._trial_running = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies (seconds)."""
+
+    def __init__(self, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """The q-th percentile (0-100), or None until HEDGE_MIN_SAMPLES have been seen."""
+        if len(self.samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[str, LatencyTracker] = {}
+counters = {"failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+        _breakers[provider] = breaker
+    return breaker
+
+
+def get_latency(key: str) -> LatencyTracker:
+    tracker = _latencies.get(key)
+    if tracker is None:
+        tracker = LatencyTracker(settings.HEDGE_LATENCY_WINDOW)
+        _latencies[key] = tracker
+    return tracker
+
+
+def hedge_delay(key: str) -> float | None:
+    """
+    Seconds to wait before hedging a request tracked under `key`: its p95
+    latency (at least HEDGE_MIN_DELAY), or HEDGE_DEFAULT_DELAY until enough
+    samples exist. None when hedging is off.
+    """
+    if not settings.HEDGE_ENABLED:
+        return None
+    p95 = get_latency(key).percentile(95)
+    if p95 is None:
+        return settings.HEDGE_DEFAULT_DELAY
+    return max(p95, settings.HEDGE_MIN_DELAY)
+
+
+async def guarded(provider: str, latency_key: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run one provider call, feeding its outcome to the breaker and its latency to the tracker."""
+    breaker = get_breaker(provider)
+    start = time.monotonic()
+    try:
+        result = await call()
+    except (asyncio.CancelledError, Overloaded):
+        # Cancelled (lost a hedge race) or shed locally: says nothing about the provider
+        breaker.record_cancelled()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    get_latency(latency_key).record(time.monotonic() - start)
+    return result
+
+
+async def race(
+    candidates: list[tuple[str, str]],
+    run: Callable[[str], Awaitable[T]],
+    delay: float | None,
+    discard: Callable[[T], Awaitable[None]] | None = None,
+) -> tuple[T, str]:
+    """
+    Run `run(name)` over candidates [(name, provider), ...] until one
+    succeeds; return (result, name).
+
+    Candidates whose provider circuit is open are skipped. When all the
+    running attempts fail, the next candidate starts (failover). With a
+    `delay`, the next candidate also starts if the only running attempt
+    hasn't finished within it (hedge); at most two run at once. Losers
+    are cancelled, and results that finished anyway go to `discard`.
+
+    Raises ChainFailed when no candidate succeeded.
+    """
+    queue = list(candidates)
+    tasks: dict[asyncio.Task, str] = {}
+    hedges: set[asyncio.Task] = set()
+    errors: list[tuple[str, Exception]] = []
+    skipped: list[str] = []
+
+    def start_next(hedge: bool = False) -> bool:
+        while queue:
+            name, provider = queue.pop(0)
+            if not get_breaker(provider).allow():
+                skipped.append(name)
+                continue
+            task = asyncio.ensure_future(run(name))
+            if hedge:
+                counters["hedges"] += 1
+                hedges.add(task)
+            elif errors:
+                counters["failovers"] += 1
+            tasks[task] = name
+            return True
+        return False
+
+    try:
+        while True:
+            if not tasks and not start_next():
+                raise ChainFailed(errors, skipped)
+
+            hedge_window = delay if delay is not None and len(tasks) == 1 and queue else None
+            done, _ = await asyncio.wait(tasks, timeout=hedge_window, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                start_next(hedge=True)
+                continue
+
+            winner = None
+            for task in done:
+                name = tasks.pop(task)
+                if task.exception() is not None:
+                    errors.append((name, task.exception()))
+                elif winner is None:
+                    winner = (task.result(), name)
+                    if task in hedges:
+                        counters["hedge_wins"] += 1
+                elif discard is not None:
+                    await discard(task.result())
+            if winner is not None:
+                return winner
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if discard is not None:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    await discard(result)
+
+
+def stats() -> dict:
+    return {
+        **counters,
+        "hedge_enabled": settings.HEDGE_ENABLED,
+        "breakers": {provider: breaker.stats() for provider, breaker in _breakers.items()},
+        "latency": {key: tracker.stats() for key, tracker in _latencies.items()},
+    }
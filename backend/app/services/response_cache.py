@@ -0,0 +1,185 @@
+"""
+Response Cache — Exact-match cache for LLM completions.
+
+Keyed on a SHA-256 of (model, normalized message list, sampling params), so
+only byte-for-byte identical requests hit. Two tiers:
+- Memory: bounded LRU, per-process, checked first
+- SQLite (optional, RESPONSE_CACHE_PATH): survives restarts, shared by
+  every worker on the host; hits are promoted into the memory tier
+
+Entries expire after RESPONSE_CACHE_TTL seconds, or the per-model value
+in RESPONSE_CACHE_MODEL_TTLS (0 turns caching off for that model).
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def request_key(model_name: str, model_id: str, messages: list[dict], params: dict) -> str:
+    """Hash a request into a cache key. Messages are normalized so incidental whitespace doesn't miss."""
+    normalized = [
+        {
+            "role": m["role"],
+            "content": m["content"].replace("\r\n", "\n").strip()
+            if isinstance(m["content"], str) else m["content"],
+        }
+        for m in messages
+    ]
+    blob = json.dumps(
+        {"model": model_name, "model_id": model_id, "messages": normalized, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL memory tier with an optional SQLite tier behind it."""
+
+    def __init__(self, max_entries: int, default_ttl: int, model_ttls: dict[str, int], path: str = ""):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.model_ttls = model_ttls
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "bypassed": 0,
+        }
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def ttl_for(self, model_name: str) -> int:
+        """TTL in seconds for a model; 0 means the model is never cached."""
+        return self.model_ttls.get(model_name, self.default_ttl)
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return value
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                expires_at, value = row
+                self._remember(key, expires_at, value)
+                self.counters["hits"] += 1
+                self.counters["disk_hits"] += 1
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, model_name: str, value: str):
+        ttl = self.ttl_for(model_name)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, value)
+        self.counters["stores"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, model_name, value, expires_at)
+
+    def bypass(self):
+        """Count a request that was deliberately not cached."""
+        self.counters["bypassed"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _db_get(self, key: str, now: float) -> tuple[float, str] | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] <= now:
+            return None
+        return row
+
+    def _db_set(self, key: str, model_name: str, value: str, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, model, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, model_name, value, expires_at),
+            )
+            self._db.commit()
+
+
+_cache: ResponseCache | None = None
+
+
+def get_cache() -> ResponseCache | None:
+    """The process-wide cache, or None when RESPONSE_CACHE_ENABLED is off."""
+    global _cache
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            default_ttl=settings.RESPONSE_CACHE_TTL,
+            model_ttls=settings.RESPONSE_CACHE_MODEL_TTLS,
+            path=settings.RESPONSE_CACHE_PATH,
+        )
+    return _cache
+
+
+def close_cache():
+    """Close the persistent tier. Called on app shutdown."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+def stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
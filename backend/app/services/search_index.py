@@ -0,0 +1,160 @@
+"""
+Search Index — Incremental BM25 ranking over short texts, scored with NumPy.
+
+Used to pick the few stored texts (memories, document chunks) that are
+relevant to the current message instead of sending all of them.
+
+Postings are kept per term and appended to as documents arrive, so adding
+a document never rebuilds the index. A query only touches the postings
+of its own terms; each term's (slot, tf) arrays are converted to NumPy
+once and cached until that term changes. Removed documents are masked out
+and their slots reclaimed when enough of them pile up.
+"""
+
+import re
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i i'm im in is it its me my of on or "
+    "so that the their them they this to was we what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords or single characters."""
+    return [t for t in _WORD_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """BM25 (Okapi) index supporting add, remove and top-k search."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids: list = []                 # slot -> doc id (None once removed)
+        self._slot_of: dict = {}             # doc id -> slot
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._alive = np.zeros(64, dtype=bool)
+        self._terms_of: list[list[str]] = []  # slot -> distinct terms, for removal bookkeeping
+        self._postings: dict[str, tuple[list[int], list[int]]] = {}
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._df: dict[str, int] = {}
+        self._total_length = 0.0
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._slot_of
+
+    def add(self, doc_id, text: str):
+        """Index a document; re-adding an existing id replaces it."""
+        if doc_id in self._slot_of:
+            self.remove(doc_id)
+
+        tokens = tokenize(text)
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        slot = len(self._ids)
+        if slot >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, slot * 2)
+            alive = np.zeros(slot * 2, dtype=bool)
+            alive[:slot] = self._alive[:slot]
+            self._alive = alive
+        self._ids.append(doc_id)
+        self._slot_of[doc_id] = slot
+        self._lengths[slot] = len(tokens)
+        self._alive[slot] = True
+        self._terms_of.append(list(counts))
+        self._total_length += len(tokens)
+
+        for term, tf in counts.items():
+            slots, tfs = self._postings.setdefault(term, ([], []))
+            slots.append(slot)
+            tfs.append(tf)
+            self._df[term] = self._df.get(term, 0) + 1
+            self._arrays.pop(term, None)
+
+    def remove(self, doc_id):
+        """Drop a document from the index (no-op if absent)."""
+        slot = self._slot_of.pop(doc_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = False
+        self._ids[slot] = None
+        self._total_length -= float(self._lengths[slot])
+        for term in self._terms_of[slot]:
+            self._df[term] -= 1
+        self._removed += 1
+        if self._removed > 64 and self._removed > len(self._slot_of):
+            self._compact()
+
+    def search(self, query: str, k: int) -> list[tuple[object, float]]:
+        """Return up to k (doc id, score) pairs with a positive score, best first."""
+        n_docs = len(self._slot_of)
+        terms = set(tokenize(query))
+        if not n_docs or not terms or k <= 0:
+            return []
+
+        n_slots = len(self._ids)
+        avg_length = max(self._total_length / n_docs, 1.0)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[:n_slots] / avg_length)
+        scores = np.zeros(n_slots, dtype=np.float32)
+        for term in terms:
+            df = self._df.get(term, 0)
+            if df <= 0:
+                continue
+            slots, tfs = self._term_arrays(term)
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norm[slots])
+
+        scores[~self._alive[:n_slots]] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._ids[slot], float(scores[slot])) for slot in candidates]
+
+    def _term_arrays(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            slots, tfs = self._postings[term]
+            arrays = (np.asarray(slots, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def _compact(self):
+        """Rebuild slots without removed documents."""
+        live = [(doc_id, slot) for doc_id, slot in self._slot_of.items()]
+        old_postings = self._postings
+        old_lengths = self._lengths
+        old_terms = self._terms_of
+        remap = {slot: new for new, (_, slot) in enumerate(sorted(live, key=lambda item: item[1]))}
+
+        self._ids = [None] * len(remap)
+        for doc_id, slot in live:
+            self._ids[remap[slot]] = doc_id
+            self._slot_of[doc_id] = remap[slot]
+        size = max(64, len(remap) * 2)
+        self._lengths = np.zeros(size, dtype=np.float32)
+        self._alive = np.zeros(size, dtype=bool)
+        self._terms_of = [[] for _ in remap]
+        for old, new in remap.items():
+            self._lengths[new] = old_lengths[old]
+            self._alive[new] = True
+            self._terms_of[new] = old_terms[old]
+
+        self._postings = {}
+        for term, (slots, tfs) in old_postings.items():
+            kept = [(remap[s], tf) for s, tf in zip(slots, tfs) if s in remap]
+            if kept:
+                self._postings[term] = ([s for s, _ in kept], [tf for _, tf in kept])
+            else:
+                self._df.pop(term, None)
+        self._arrays = {}
+        self._removed = 0
@@ -0,0 +1,146 @@
+"""
+Summary Service — Rolling summaries of long conversations.
+
+Messages that fall out of the short-term window would otherwise be lost
+to the model. Instead, each ChatSession keeps a running summary of them
+(ChatSession.summary), extended incrementally by a cheap model in the
+background as more messages age out. summarized_until (with
+summarized_until_id) marks the newest message already folded in, so
+nothing is summarized twice and each chat turn only has to read the one
+session row.
+"""
+
+import logging
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import ChatSession, Message
+from app.metrics import timed_db
+from app.pagination import Cursor
+from app.services import background, model_router
+from app.services.tokenizer import truncate_to_tokens
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the existing summary with the new messages. Keep facts, decisions, open questions "
+    "and anything the user asked to remember; drop pleasantries. Reply with the updated summary "
+    "only, in at most {words} words."
+)
+
+# Each message is clipped to this many tokens before being summarized
+_MESSAGE_CLIP_TOKENS = 400
+
+# Sessions with an update queued or running, so one session never has two at once
+_in_progress: set[str] = set()
+
+
+@timed_db
+async def get_summary(db: AsyncSession, session_id: str) -> tuple[str | None, Cursor | None]:
+    """Return (summary, position of the last message it covers) for a session."""
+    row = (await db.execute(
+        select(ChatSession.summary, ChatSession.summarized_until, ChatSession.summarized_until_id)
+        .where(ChatSession.id == session_id)
+    )).first()
+    if row is None:
+        return None, None
+    until = Cursor(row.summarized_until, row.summarized_until_id or "") if row.summarized_until else None
+    return row.summary, until
+
+
+def format_summary_context(summary: str | None) -> str:
+    """Format a session summary for the system prompt, clipped to CONTEXT_SUMMARY_TOKENS."""
+    if not summary:
+        return ""
+    summary = truncate_to_tokens(summary, settings.CONTEXT_SUMMARY_TOKENS)
+    return f"Summary of the earlier part of this conversation:\n{summary}"
+
+
+def needs_update(left_out: Cursor | None, summarized_until: Cursor | None) -> bool:
+    """
+    Whether the summary is missing messages left out of the short-term
+    window: `left_out` is the newest of them (see get_short_term_memory).
+    """
+    if not settings.SUMMARY_ENABLED or left_out is None:
+        return False
+    return summarized_until is None or summarized_until < left_out
+
+
+def schedule_update(session_id: str, until: Cursor):
+    """Start a background summary update for a session unless one is already running."""
+    if session_id in _in_progress or not model_router.is_available(settings.SUMMARY_MODEL):
+        return
+    _in_progress.add(session_id)
+    if not background.jobs.submit(_run_update, session_id, until):
+        _in_progress.discard(session_id)
+
+
+async def _run_update(session_id: str, until: Cursor):
+    try:
+        await update_summary(session_id, until)
+    except Exception:
+        logger.exception("Summary update failed for session %s", session_id)
+    finally:
+        _in_progress.discard(session_id)
+
+
+async def update_summary(session_id: str, until: Cursor):
+    """
+    Fold every message up to `until` (inclusive) that isn't summarized yet
+    into the session summary, SUMMARY_BATCH_MESSAGES at a time.
+    """
+    while True:
+        # Short-lived sessions on either side of the model call, so no
+        # connection is held while waiting on the provider
+        async with SessionLocal() as db:
+            summary, summarized_until = await get_summary(db, session_id)
+
+            key = tuple_(Message.created_at, Message.id)
+            query = select(Message.role, Message.content, Message.created_at, Message.id).where(
+                Message.session_id == session_id,
+                key <= tuple_(until.timestamp, until.id),
+            )
+            if summarized_until is not None:
+                query = query.where(key > tuple_(summarized_until.timestamp, summarized_until.id))
+            rows = (await db.execute(
+                query.order_by(Message.created_at.asc(), Message.id.asc()).limit(settings.SUMMARY_BATCH_MESSAGES)
+            )).all()
+        if not rows:
+            return
+
+        transcript = "\n\n".join(
+            f"{role}: {truncate_to_tokens(content, _MESSAGE_CLIP_TOKENS)}" for role, content, _, _ in rows
+        )
+        words = max(settings.CONTEXT_SUMMARY_TOKENS * 3 // 4, 50)
+        summary = await model_router.complete(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=words)},
+                {
+                    "role": "user",
+                    "content": f"Existing summary:\n{summary or '(none yet)'}\n\n"
+                               f"New messages:\n{transcript}",
+                },
+            ],
+            model_name=settings.SUMMARY_MODEL,
+            max_tokens=settings.CONTEXT_SUMMARY_TOKENS,
+        )
+
+        async with SessionLocal() as db:
+            await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id)
+                # Keep updated_at as is — a summary isn't user activity
+                .values(
+                    summary=summary.strip(),
+                    summarized_until=rows[-1].created_at,
+                    summarized_until_id=rows[-1].id,
+                    updated_at=ChatSession.updated_at,
+                )
+            )
+            await db.commit()
+
+        if len(rows) < settings.SUMMARY_BATCH_MESSAGES:
+            return
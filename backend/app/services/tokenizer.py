@@ -0,0 +1,60 @@
+"""
+Tokenizer — Fast local token estimates for context budgeting.
+
+We don't ship a real BPE vocabulary for every provider, so this counts
+word/punctuation pieces and charges extra for long words and non-ASCII
+text. It deliberately errs on the high side: overestimating costs a few
+messages of history, underestimating gets a 400 from the provider.
+"""
+
+import re
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Chat formats wrap every message in a few framing tokens (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens `text` costs."""
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece.isascii():
+            # BPE vocabularies cover common words whole; long ones split every ~6 chars
+            count += 1 + (len(piece) - 1) // 6
+        else:
+            # CJK and other scripts run close to one token per character
+            count += len(piece)
+    return count
+
+
+def estimate_message_tokens(message: dict) -> int:
+    """Estimate the cost of one {"role", "content"} chat message."""
+    content = message["content"]
+    if not isinstance(content, str):
+        content = " ".join(part.get("text", "") for part in content)
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten `text` to roughly `max_tokens`, keeping its beginning and end.
+
+    Long user messages usually carry a pasted document with the actual
+    question at one end, so the middle is the cheapest part to drop.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    marker = "\n\n[... truncated to fit the context window ...]\n\n"
+    # Scale by the observed chars-per-token ratio, then tighten until it fits
+    ratio = len(text) / max(estimate_tokens(text), 1)
+    keep = int(max(max_tokens - estimate_tokens(marker), 0) * ratio)
+    while keep > 0:
+        head, tail = text[: keep // 2], text[len(text) - keep // 2:]
+        candidate = f"{head}{marker}{tail}"
+        if estimate_tokens(candidate) <= max_tokens:
+            return candidate
+        keep = int(keep * 0.9)
+    return ""
@@ -0,0 +1,264 @@
+"""
+Tracing — Lightweight spans showing where a request spent its time.
+
+TracingMiddleware opens a root span per HTTP request. It continues the
+trace from an incoming W3C `traceparent` header when there is one, and
+returns the request's own `traceparent` in the response so a slow turn
+can be looked up. Inside a request, `with tracing.span("name", key=value):`
+records a child of the current span (kept in a contextvar, so it follows
+awaits and tasks started from the request).
+
+Sampling is decided once per request: an incoming traceparent's sampled
+flag is honoured (TRACE_FOLLOW_PARENT), otherwise TRACE_SAMPLE_RATE of
+requests are traced. Outside a sampled request span() returns a shared
+no-op, so instrumented code costs a contextvar lookup.
+
+Finished spans are exported in batches from a background queue:
+- "jsonl": one span per line in TRACE_FILE, rotated at TRACE_FILE_MAX_BYTES
+- "otlp": OTLP/HTTP JSON posted to TRACE_OTLP_ENDPOINT (an OpenTelemetry
+  collector, Jaeger or Tempo)
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+import httpx
+from app.config import get_settings
+from app.services import background
+
+settings = get_settings()
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation. Use as a context manager, or call end() yourself."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+        self._token = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, error: BaseException | None = None):
+        """Finish the span and queue it for export. Only the first call counts."""
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        _exports.submit(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span outside sampled requests."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+    def end(self, error: BaseException | None = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attributes) -> Span | _NoopSpan:
+    """
+    A child of the current span. Entering it (`with`) makes it current;
+    for work that outlives a block (an open stream) keep it and call end().
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace_id, parent.span_id, name, attributes)
+
+
+def _parse_traceparent(headers: list[tuple[bytes, bytes]]) -> tuple[str | None, str | None, bool | None]:
+    """(trace id, parent span id, sampled) from a valid traceparent header, else Nones."""
+    for key, value in headers:
+        if key == b"traceparent":
+            match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+            if match and match[1] != "0" * 32 and match[2] != "0" * 16:
+                return match[1], match[2], bool(int(match[3], 16) & 1)
+            break
+    return None, None, None
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: a root span per sampled HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled = _parse_traceparent(scope["headers"])
+        if sampled is None or not settings.TRACE_FOLLOW_PARENT:
+            sampled = random.random() < settings.TRACE_SAMPLE_RATE
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(trace_id or os.urandom(16).hex(), parent_id, "http", {"http.method": scope["method"]})
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"traceparent", root.traceparent().encode())],
+                }
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Named after the route template, known once the router has matched
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                root.name = f"{scope['method']} {route}"
+                root.set("http.route", route)
+
+
+# ── Export ──
+
+def _rotate(path: str):
+    """Shift path -> path.1 -> ... -> path.TRACE_FILE_BACKUPS, dropping the oldest."""
+    backups = settings.TRACE_FILE_BACKUPS
+    if backups <= 0:
+        os.remove(path)
+        return
+    for index in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{index}"):
+            os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _write_jsonl(lines: list[str]):
+    path = settings.TRACE_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path) and os.path.getsize(path) >= settings.TRACE_FILE_MAX_BYTES:
+        _rotate(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(spans: list[Span]) -> dict:
+    """OTLP/HTTP JSON (ExportTraceServiceRequest) for a batch of spans."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.APP_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": 2 if "http.route" in s.attributes else 1,  # SERVER for roots, else INTERNAL
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                        "status": {"code": 2, "message": s.error} if s.error else {},
+                    }
+                    for s in spans
+                ],
+            }],
+        }],
+    }
+
+
+_otlp_client: httpx.AsyncClient | None = None
+
+
+async def _export(spans: list[Span]):
+    global _otlp_client
+    if settings.TRACE_EXPORTER == "otlp":
+        if _otlp_client is None:
+            _otlp_client = httpx.AsyncClient(timeout=settings.TRACE_OTLP_TIMEOUT)
+        response = await _otlp_client.post(settings.TRACE_OTLP_ENDPOINT, json=_otlp_payload(spans))
+        response.raise_for_status()
+    else:
+        lines = [json.dumps(s.to_dict(), default=str) for s in spans]
+        await asyncio.to_thread(_write_jsonl, lines)
+
+
+_exports = background.BatchQueue(
+    "trace_export",
+    _export,
+    max_batch=settings.TRACE_EXPORT_BATCH,
+    max_delay=settings.TRACE_EXPORT_DELAY,
+    max_size=settings.TRACE_QUEUE_SIZE,
+)
+
+
+async def close_exporter():
+    """Close the OTLP client. Called on app shutdown, after the queues have drained."""
+    global _otlp_client
+    if _otlp_client is not None:
+        await _otlp_client.aclose()
+        _otlp_client = None
@@ -0,0 +1,190 @@
+"""
+Index benchmark — latency of the hot chat queries before and after the
+composite indexes (migrations 1 and 3).
+
+Builds a throwaway SQLite database with the app schema, fills it with
+synthetic users, sessions, messages and memories, and times each query
+shape first without the composite indexes and then after applying the
+migration statements.
+
+Usage (from backend/):
+    python -m benchmarks.bench_indexes                  # 1M messages
+    python -m benchmarks.bench_indexes --messages 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from app.database import Base
+from app import models  # noqa: F401 — register tables on Base.metadata
+from app.migrations import MIGRATIONS
+
+COMPOSITE_INDEXES = [
+    "ix_messages_session_id_created_at",
+    "ix_chat_sessions_user_id_updated_at",
+    "ix_messages_session_id_created_at_id",
+    "ix_chat_sessions_user_id_updated_at_id",
+    "ix_memory_store_user_id_key",
+]
+INDEX_MIGRATIONS = {1, 3}
+
+# The query shapes issued on every chat turn / page load
+QUERIES = {
+    "short_term_window": (
+        "SELECT * FROM messages WHERE session_id = :session_id "
+        "ORDER BY created_at DESC LIMIT 20"
+    ),
+    "session_list": (
+        "SELECT * FROM chat_sessions WHERE user_id = :user_id "
+        "ORDER BY updated_at DESC, id DESC LIMIT 51"
+    ),
+    "history_page": (
+        "SELECT * FROM messages WHERE session_id = :session_id "
+        "AND (created_at, id) < (:cursor_ts, :cursor_id) "
+        "ORDER BY created_at DESC, id DESC LIMIT 101"
+    ),
+    "memory_upsert_lookup": (
+        "SELECT * FROM memory_store WHERE user_id = :user_id AND key = :key LIMIT 1"
+    ),
+}
+
+
+def build_database(path: str, n_messages: int, n_sessions: int, n_users: int, n_memories: int):
+    """Create the schema without the composite indexes and fill it with synthetic rows."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    for name in COMPOSITE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    user_ids = [str(uuid.uuid4()) for _ in range(n_users)]
+    conn.executemany(
+        "INSERT INTO users (id, email, display_name, provider, created_at) VALUES (?, ?, ?, 'demo', ?)",
+        [(uid, f"user{i}@example.com", f"User {i}", start) for i, uid in enumerate(user_ids)],
+    )
+
+    sessions = [(str(uuid.uuid4()), rng.choice(user_ids)) for _ in range(n_sessions)]
+    conn.executemany(
+        "INSERT INTO chat_sessions (id, user_id, title, created_at, updated_at) VALUES (?, ?, 'Chat', ?, ?)",
+        [(sid, uid, start, start + timedelta(seconds=rng.randrange(10**7))) for sid, uid in sessions],
+    )
+
+    batch = []
+    for i in range(n_messages):
+        sid = sessions[rng.randrange(n_sessions)][0]
+        batch.append((
+            str(uuid.uuid4()), sid, "user" if i % 2 == 0 else "assistant",
+            "lorem ipsum dolor sit amet " * 4, start + timedelta(seconds=i),
+        ))
+        if len(batch) == 50_000:
+            conn.executemany(
+                "INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch
+            )
+            batch.clear()
+    if batch:
+        conn.executemany(
+            "INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch
+        )
+
+    keys = ["name", "identity", "location", "workplace", "preference", "likes", "remembered_fact"]
+    conn.executemany(
+        "INSERT INTO memory_store (user_id, key, value, category, created_at) VALUES (?, ?, ?, 'auto-extracted', ?)",
+        [(rng.choice(user_ids), rng.choice(keys), "value", start) for _ in range(n_memories)],
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return user_ids, [sid for sid, _ in sessions]
+
+
+def time_queries(path: str, user_ids: list[str], session_ids: list[str], iterations: int) -> dict:
+    """Run each query shape `iterations` times with random parameters; return latency stats in ms."""
+    conn = sqlite3.connect(path)
+    rng = random.Random(7)
+    results = {}
+    for name, sql in QUERIES.items():
+        samples = []
+        for _ in range(iterations):
+            params = {
+                "session_id": rng.choice(session_ids),
+                "user_id": rng.choice(user_ids),
+                "key": "name",
+                "cursor_ts": "2024-06-01 00:00:00.000000",
+                "cursor_id": "",
+            }
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        results[name] = {
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+            "mean_ms": round(statistics.fmean(samples), 3),
+        }
+    conn.close()
+    return results
+
+
+def apply_index_migration(path: str):
+    """Apply the index migrations' statements, exactly as init_db would."""
+    conn = sqlite3.connect(path)
+    for version, _, statements in MIGRATIONS:
+        if version in INDEX_MIGRATIONS:
+            for statement in statements:
+                conn.execute(statement)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--memories", type=int, default=50_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        user_ids, session_ids = build_database(path, args.messages, args.sessions, args.users, args.memories)
+        build_s = time.perf_counter() - t0
+
+        before = time_queries(path, user_ids, session_ids, args.iterations)
+        t0 = time.perf_counter()
+        apply_index_migration(path)
+        migrate_s = time.perf_counter() - t0
+        after = time_queries(path, user_ids, session_ids, args.iterations)
+
+    report = {
+        "rows": {"messages": args.messages, "sessions": args.sessions,
+                 "users": args.users, "memories": args.memories},
+        "build_seconds": round(build_s, 1),
+        "migration_seconds": round(migrate_s, 1),
+        "before": before,
+        "after": after,
+        "speedup_p50": {
+            name: round(before[name]["p50_ms"] / max(after[name]["p50_ms"], 1e-6), 1) for name in QUERIES
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
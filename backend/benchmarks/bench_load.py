@@ -0,0 +1,232 @@
+"""
+Load benchmark — end-to-end throughput and latency of a running backend.
+
+--users virtual users each log in (demo-login), then repeat until
+--duration is up: create a session, attach a document, send --turns
+messages and fetch the history. Every request is timed per stage; the
+report gives RPS and p50/p95/p99 per stage as JSON, tagged with the git
+commit, so runs can be compared across commits (--baseline adds the
+deltas against an earlier report).
+
+Point the backend at the fake provider so the numbers are this
+backend's, not an upstream API's:
+
+Usage (from backend/):
+    python -m benchmarks.fake_provider --port 9100 --latency lognormal:0.3,0.3 &
+    COMPETITION_BASE_URL=http://127.0.0.1:9100/v1 COMPETITION_API_KEY=x COMPETITION_MODEL_IDS=fake-model \\
+        uvicorn app.main:app --port 8000 &
+    python -m benchmarks.bench_load --model fake-model --users 20 --duration 30 --output before.json
+    python -m benchmarks.bench_load --model fake-model --users 20 --duration 30 --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+DOCUMENT = (
+    "Quarterly report. Revenue grew in every region; the largest gains came from the new "
+    "subscription tier. Support tickets fell after the onboarding redesign. "
+) * 40
+
+QUESTIONS = [
+    "Summarize the attached report in two sentences.",
+    "Which region grew the most, and why?",
+    "What changed in support after the redesign?",
+    "Give me three follow-up questions for the team.",
+]
+
+
+class Recorder:
+    """Latencies (ms) and failures per stage."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, Counter] = defaultdict(Counter)
+
+    async def timed(self, stage: str, request):
+        """Await `request` (an httpx call), record it under `stage`; the response, or None on failure."""
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as e:
+            self.errors[stage][type(e).__name__] += 1
+            return None
+        self.latencies[stage].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[stage][str(response.status_code)] += 1
+            return None
+        return response
+
+    def record(self, stage: str, milliseconds: float):
+        self.latencies[stage].append(milliseconds)
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def summarize(samples: list[float], errors: Counter) -> dict:
+    ordered = sorted(samples)
+    summary = {"count": len(ordered), "errors": sum(errors.values())}
+    if errors:
+        summary["error_kinds"] = dict(errors)
+    if ordered:
+        summary.update({
+            "p50_ms": round(percentile(ordered, 50), 2),
+            "p95_ms": round(percentile(ordered, 95), 2),
+            "p99_ms": round(percentile(ordered, 99), 2),
+            "mean_ms": round(sum(ordered) / len(ordered), 2),
+            "max_ms": round(ordered[-1], 2),
+        })
+    return summary
+
+
+async def send_streaming(client: httpx.AsyncClient, recorder: Recorder, session_id: str, body: dict):
+    """Stream one reply, recording time to the first delta and to the final event."""
+    start = time.perf_counter()
+    first_delta = None
+    try:
+        async with client.stream("POST", f"/api/chat/sessions/{session_id}/messages/stream", json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                recorder.errors["stream_message"][str(response.status_code)] += 1
+                return
+            async for line in response.aiter_lines():
+                if first_delta is None and line == "event: delta":
+                    first_delta = time.perf_counter()
+    except httpx.HTTPError as e:
+        recorder.errors["stream_message"][type(e).__name__] += 1
+        return
+    end = time.perf_counter()
+    recorder.record("stream_message", (end - start) * 1000)
+    if first_delta is not None:
+        recorder.record("stream_first_delta", (first_delta - start) * 1000)
+
+
+async def virtual_user(index: int, args, recorder: Recorder, deadline: float, turns_done: list[int]):
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        response = await recorder.timed(
+            "demo_login",
+            client.post("/api/auth/demo-login", json={"email": f"bench{index}@example.com", "display_name": f"Bench {index}"}),
+        )
+        if response is None:
+            return
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        while time.perf_counter() < deadline:
+            response = await recorder.timed("create_session", client.post("/api/chat/sessions", json={"title": "New Chat"}))
+            if response is None:
+                await asyncio.sleep(0.5)
+                continue
+            session_id = response.json()["id"]
+
+            if not args.no_documents:
+                await recorder.timed(
+                    "upload_document",
+                    client.post(
+                        f"/api/chat/sessions/{session_id}/documents",
+                        files={"file": ("report.txt", DOCUMENT.encode(), "text/plain")},
+                    ),
+                )
+
+            for turn in range(args.turns):
+                if time.perf_counter() >= deadline:
+                    break
+                body = {"content": QUESTIONS[(index + turn) % len(QUESTIONS)], "model": args.model}
+                if args.stream:
+                    await send_streaming(client, recorder, session_id, body)
+                else:
+                    await recorder.timed("send_message", client.post(f"/api/chat/sessions/{session_id}/messages", json=body))
+                turns_done[0] += 1
+
+            await recorder.timed("fetch_history", client.get(f"/api/chat/sessions/{session_id}/messages"))
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Percent change of throughput and per-stage percentiles against a baseline report."""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if new is not None and old else None
+
+    stages = {}
+    for stage, summary in report["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before:
+            stages[stage] = {key: change(summary.get(key), before.get(key)) for key in ("p50_ms", "p95_ms", "p99_ms")}
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "rps_change_pct": change(report["rps"], baseline["rps"]),
+        "stages_change_pct": stages,
+    }
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    turns_done = [0]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(virtual_user(i, args, recorder, deadline, turns_done) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    stages = {stage: summarize(recorder.latencies[stage], recorder.errors[stage])
+              for stage in sorted(set(recorder.latencies) | set(recorder.errors))}
+    requests = sum(s["count"] for name, s in stages.items() if name != "stream_first_delta")
+    errors = sum(s["errors"] for s in stages.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "url": args.url, "model": args.model, "users": args.users, "duration": args.duration,
+            "turns": args.turns, "stream": args.stream, "documents": not args.no_documents,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 2),
+        "turns_per_second": round(turns_done[0] / elapsed, 2),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--model", default=None, help="model name to chat with (default: the backend's DEFAULT_MODEL)")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to keep starting new work")
+    parser.add_argument("--turns", type=int, default=3, help="messages per session")
+    parser.add_argument("--stream", action="store_true", help="use the streaming endpoint (adds time to first delta)")
+    parser.add_argument("--no-documents", action="store_true", help="skip the document upload stage")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="an earlier report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
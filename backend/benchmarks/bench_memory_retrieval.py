@@ -0,0 +1,128 @@
+"""
+Memory retrieval benchmark — latency of relevance-ranked long-term memory
+lookup for a user with many memories.
+
+Builds a throwaway SQLite database holding one user with --memories
+synthetic facts, then times:
+- recency: the old "50 most recent memories" query
+- cold: first memory_index.search for the user (loads rows, builds the index)
+- warm: memory_index.search per chat message once the index is built
+- add: memory_index.on_saved for a new memory (incremental index update)
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory_retrieval                   # 10k memories
+    python -m benchmarks.bench_memory_retrieval --memories 50000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+WORDS = (
+    "python rust golang java kotlin swift react vue django flask postgres redis kafka docker "
+    "kubernetes linux macos windows coffee tea chess running cycling hiking climbing guitar piano "
+    "jazz metal opera berlin paris tokyo london toronto sydney vegan spicy sushi pizza ramen curry "
+    "dog cat parrot novel poetry anime football tennis cricket physics biology finance marketing "
+    "startup remote office morning evening weekend holiday sister brother daughter son wife husband"
+).split()
+KEYS = ["name", "identity", "location", "workplace", "preference", "likes", "remembered_fact",
+        "favorite food", "favorite language", "favorite city"]
+
+
+def _stats(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[max(int(len(samples) * 0.95) - 1, 0)], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def _phrase(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+async def run(args) -> dict:
+    # Imported here so DATABASE_URL (set in main) is picked up by the app settings
+    from sqlalchemy import insert, select
+    from app.database import SessionLocal, init_db
+    from app.models import MemoryStore, User
+    from app.services import memory_index
+
+    rng = random.Random(42)
+    user_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1)
+    await init_db()
+    async with SessionLocal() as db:
+        await db.execute(insert(User).values(
+            id=user_id, email="bench@example.com", display_name="Bench", provider="demo", created_at=start
+        ))
+        await db.execute(insert(MemoryStore), [
+            {
+                "user_id": user_id, "key": rng.choice(KEYS), "value": _phrase(rng, rng.randint(3, 12)),
+                "category": "auto-extracted", "created_at": start + timedelta(seconds=i),
+            }
+            for i in range(args.memories)
+        ])
+        await db.commit()
+
+    queries = [f"what do you think about {_phrase(rng, rng.randint(2, 8))}?" for _ in range(args.iterations)]
+    report = {"memories": args.memories, "top_k": args.top_k, "iterations": args.iterations}
+
+    async with SessionLocal() as db:
+        samples = []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            list(await db.scalars(
+                select(MemoryStore).where(MemoryStore.user_id == user_id)
+                .order_by(MemoryStore.created_at.desc()).limit(50)
+            ))
+            samples.append((time.perf_counter() - t0) * 1000)
+        report["recency_query"] = _stats(samples)
+
+        t0 = time.perf_counter()
+        await memory_index.search(db, user_id, queries[0], args.top_k)
+        report["cold_build_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        samples = []
+        for query in queries:
+            t0 = time.perf_counter()
+            await memory_index.search(db, user_id, query, args.top_k)
+            samples.append((time.perf_counter() - t0) * 1000)
+        report["warm_search"] = _stats(samples)
+
+        samples = []
+        for i in range(args.iterations):
+            memory = MemoryStore(
+                id=args.memories + i + 1, user_id=user_id, key=rng.choice(KEYS),
+                value=_phrase(rng, 6), category="manual", created_at=datetime.utcnow(),
+            )
+            t0 = time.perf_counter()
+            memory_index.on_saved(user_id, memory)
+            samples.append((time.perf_counter() - t0) * 1000)
+        report["incremental_add"] = _stats(samples)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memories", type=int, default=10_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
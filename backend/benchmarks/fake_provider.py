@@ -0,0 +1,193 @@
+"""
+Fake provider — a local OpenAI-compatible /chat/completions server for
+load tests, so benchmarks measure this backend rather than a real API.
+
+Streaming and non-streaming completions, with latency drawn from a
+configurable distribution and a share of requests failing:
+- --latency: total time of a non-streaming reply
+- --ttft / --inter-token: time to the first streamed chunk, and between chunks
+- --error-rate: share answered 500, --rate-limit-rate: share answered 429
+  (with Retry-After)
+
+Distributions are "<kind>:<params>" in seconds:
+    fixed:0.2   uniform:0.1,0.5   normal:0.3,0.05   lognormal:0.3,0.5 (median, sigma)
+    exponential:0.3 (mean)
+
+Usage (from backend/):
+    python -m benchmarks.fake_provider --port 9100 --latency lognormal:0.4,0.3 --error-rate 0.01
+    COMPETITION_BASE_URL=http://127.0.0.1:9100/v1 COMPETITION_API_KEY=x \\
+        COMPETITION_MODEL_IDS=fake-model uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = "the quick brown fox jumps over the lazy dog while the model thinks about your question".split()
+
+
+def parse_distribution(spec: str) -> Callable[[], float]:
+    """A sampler for a "<kind>:<params>" latency spec (seconds, never negative)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: random.uniform(values[0], values[1]),
+        "normal": lambda: random.gauss(values[0], values[1]),
+        "lognormal": lambda: values[0] * random.lognormvariate(0, values[1]),
+        "exponential": lambda: random.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise argparse.ArgumentTypeError(f"unknown distribution {kind!r}; expected one of {', '.join(samplers)}")
+    sampler = samplers[kind]
+    try:
+        sampler()
+    except (IndexError, ZeroDivisionError) as e:
+        raise argparse.ArgumentTypeError(f"bad parameters for {kind}: {params!r}") from e
+    return lambda: max(0.0, sampler())
+
+
+@dataclass
+class Behaviour:
+    latency: Callable[[], float]
+    ttft: Callable[[], float]
+    inter_token: Callable[[], float]
+    completion_tokens: int
+    error_rate: float
+    rate_limit_rate: float
+
+
+behaviour = Behaviour(
+    latency=parse_distribution("fixed:0.3"),
+    ttft=parse_distribution("fixed:0.2"),
+    inter_token=parse_distribution("fixed:0.01"),
+    completion_tokens=50,
+    error_rate=0.0,
+    rate_limit_rate=0.0,
+)
+counters = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0}
+
+app = FastAPI(title="Fake provider")
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    text = " ".join(m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content")) for m in messages)
+    return max(1, len(text) // 4)
+
+
+def _reply_words() -> list[str]:
+    return [WORDS[i % len(WORDS)] for i in range(behaviour.completion_tokens)]
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    roll = random.random()
+    if roll < behaviour.error_rate:
+        counters["errors"] += 1
+        return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=500)
+    if roll < behaviour.error_rate + behaviour.rate_limit_rate:
+        counters["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "injected rate limit", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    model = body.get("model", "fake-model")
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": _prompt_tokens(body.get("messages", [])),
+        "completion_tokens": behaviour.completion_tokens,
+        "total_tokens": 0,
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+    if not body.get("stream"):
+        await asyncio.sleep(behaviour.latency())
+        return {
+            "id": f"chatcmpl-{counters['requests']}",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(_reply_words())},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    counters["streams"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: dict, finish_reason: str | None = None, **extra) -> str:
+        payload = {
+            "id": f"chatcmpl-{counters['requests']}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def events():
+        await asyncio.sleep(behaviour.ttft())
+        for i, word in enumerate(_reply_words()):
+            if i:
+                await asyncio.sleep(behaviour.inter_token())
+            yield chunk({"content": word if i == 0 else f" {word}"})
+        yield chunk({}, "stop")
+        if include_usage:
+            yield chunk(None, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "benchmarks"}]}
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=parse_distribution, default="fixed:0.3")
+    parser.add_argument("--ttft", type=parse_distribution, default="fixed:0.2")
+    parser.add_argument("--inter-token", type=parse_distribution, default="fixed:0.01")
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    behaviour.latency = args.latency
+    behaviour.ttft = args.ttft
+    behaviour.inter_token = args.inter_token
+    behaviour.completion_tokens = args.completion_tokens
+    behaviour.error_rate = args.error_rate
+    behaviour.rate_limit_rate = args.rate_limit_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
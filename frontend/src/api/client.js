@@ -37,16 +37,75 @@ export const getMe = () => api.get('/auth/me');
 // ── Chat ──
 export const getModels = () => api.get('/chat/models');
 export const createSession = (title) => api.post('/chat/sessions', { title });
-export const getSessions = () => api.get('/chat/sessions');
+// Paginated lists: pass { before } from a response's x-before-cursor header for the next (older) page
+export const getSessions = (params) => api.get('/chat/sessions', { params });
 export const deleteSession = (id) => api.delete(`/chat/sessions/${id}`);
-export const getMessages = (sessionId) => api.get(`/chat/sessions/${sessionId}/messages`);
-export const sendMessage = (sessionId, content, model, imageBase64) =>
+export const getMessages = (sessionId, params) => api.get(`/chat/sessions/${sessionId}/messages`, { params });
+export const sendMessage = (sessionId, content, model, imageId) =>
     api.post(`/chat/sessions/${sessionId}/messages`, {
         content,
         model: model || undefined,
-        image_base64: imageBase64 || undefined,
+        image_id: imageId || undefined,
     });
 
+// Uploads an image (multipart) and returns { id, url, ... }; send the id with the message
+export const uploadImage = (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/chat/images', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+};
+
+// Reads a Server-Sent Events response body, calling onEvent(event, data) per frame
+const readEvents = async (res, onEvent) => {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+};
+
+// Streams the reply as Server-Sent Events. onEvent(event, data) is called for
+// `user_message`, every `delta` and the final `assistant_message`.
+export const streamMessage = async (sessionId, content, model, imageId, onEvent) => {
+    const token = localStorage.getItem('token');
+    const res = await fetch(`${API_BASE}/chat/sessions/${sessionId}/messages/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({
+            content,
+            model: model || undefined,
+            image_id: imageId || undefined,
+        }),
+    });
+    if (!res.ok) {
+        const error = new Error(`Stream request failed with status ${res.status}`);
+        error.status = res.status;
+        error.retryAfter = res.headers.get('Retry-After');
+        throw error;
+    }
+    await readEvents(res, onEvent);
+};
+
 export const uploadDocument = (file) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -57,6 +116,27 @@ export const uploadDocument = (file) => {
     });
 };
 
+// ── Session documents ──
+export const getDocuments = (sessionId) => api.get(`/chat/sessions/${sessionId}/documents`);
+export const deleteDocument = (sessionId, documentId) =>
+    api.delete(`/chat/sessions/${sessionId}/documents/${documentId}`);
+
+// Streams extraction progress: onEvent('progress' | 'document' | 'error', data)
+export const attachDocumentStream = async (sessionId, file, onEvent) => {
+    const token = localStorage.getItem('token');
+    const formData = new FormData();
+    formData.append('file', file);
+    const res = await fetch(`${API_BASE}/chat/sessions/${sessionId}/documents/stream`, {
+        method: 'POST',
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        body: formData,
+    });
+    if (!res.ok) {
+        throw new Error(`Upload failed with status ${res.status}`);
+    }
+    await readEvents(res, onEvent);
+};
+
 // ── Memory ──
 export const getMemories = () => api.get('/memory/');
 export const clearMemories = () => api.delete('/memory/');
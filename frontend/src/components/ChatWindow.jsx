@@ -3,12 +3,14 @@ import MessageBubble from './MessageBubble';
 import TypingIndicator from './TypingIndicator';
 import { Bot, Sparkles } from 'lucide-react';
 
-export default function ChatWindow({ messages, isTyping, starterPrompts, onSelectPrompt }) {
+export default function ChatWindow({ messages, isTyping, starterPrompts, onSelectPrompt, onLoadEarlier }) {
     const bottomRef = useRef(null);
 
+    // Follow the newest message; prepending earlier pages leaves it unchanged, so doesn't scroll
+    const lastMessage = messages[messages.length - 1];
     useEffect(() => {
         bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
-    }, [messages, isTyping]);
+    }, [lastMessage, isTyping]);
 
     if (messages.length === 0 && !isTyping) {
         return (
@@ -39,6 +41,14 @@ export default function ChatWindow({ messages, isTyping, starterPrompts, onSelec
     return (
         <div className="flex-1 overflow-y-auto px-4 md:px-8 py-6">
             <div className="max-w-3xl mx-auto space-y-5">
+                {onLoadEarlier && (
+                    <button
+                        onClick={onLoadEarlier}
+                        className="block mx-auto px-3 py-1.5 text-xs text-dark-400 hover:text-dark-100 transition-colors"
+                    >
+                        Load earlier messages
+                    </button>
+                )}
                 {messages.map((msg) => (
                     <MessageBubble key={msg.id} message={msg} />
                 ))}
@@ -7,13 +7,9 @@ export default function ImageUpload({ imagePreview, onImageSelect, onClear }) {
     const handleFileChange = (e) => {
         const file = e.target.files?.[0];
         if (!file) return;
-
-        const reader = new FileReader();
-        reader.onload = (ev) => {
-            const base64 = ev.target.result.split(',')[1]; // strip data:...;base64,
-            onImageSelect(base64, ev.target.result);
-        };
-        reader.readAsDataURL(file);
+        // The file itself is uploaded as multipart on send; no base64 round trip
+        onImageSelect(file, URL.createObjectURL(file));
+        e.target.value = '';
     };
 
     return (
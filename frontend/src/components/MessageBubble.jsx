@@ -28,9 +28,18 @@ export default function MessageBubble({ message }) {
                     : 'bg-dark-700 border border-dark-500/50 rounded-tl-sm'
                 }`}>
                 {message.image_url && (
-                    <div className="mb-2 text-xs text-dark-300 flex items-center gap-1">
-                        📎 Image attached
-                    </div>
+                    /^(\/|blob:|https?:)/.test(message.image_url) ? (
+                        <img
+                            src={message.image_url}
+                            alt="Attached"
+                            loading="lazy"
+                            className="mb-2 max-h-64 rounded-lg border border-dark-500/50"
+                        />
+                    ) : (
+                        <div className="mb-2 text-xs text-dark-300 flex items-center gap-1">
+                            📎 Image attached
+                        </div>
+                    )
                 )}
 
                 {isUser ? (
@@ -1,7 +1,7 @@
 import { Plus, Trash2, MessageSquare, LogOut, Bot } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 
-export default function Sidebar({ sessions, activeId, onSelect, onCreate, onDelete, collapsed }) {
+export default function Sidebar({ sessions, activeId, onSelect, onCreate, onDelete, onLoadMore, collapsed }) {
     const { user, logout } = useAuth();
 
     const formatDate = (dateStr) => {
@@ -65,6 +65,14 @@ export default function Sidebar({ sessions, activeId, onSelect, onCreate, onDele
                         </button>
                     </div>
                 ))}
+                {onLoadMore && (
+                    <button
+                        onClick={onLoadMore}
+                        className="w-full px-3 py-2 text-xs text-dark-400 hover:text-dark-100 transition-colors"
+                    >
+                        Load older chats
+                    </button>
+                )}
             </div>
 
             {/* User */}
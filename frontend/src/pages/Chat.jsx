@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { getSessions, createSession, deleteSession, getMessages, sendMessage as apiSendMessage, uploadDocument } from '../api/client';
+import { getSessions, createSession, deleteSession, getMessages, streamMessage, uploadImage, getDocuments, deleteDocument, attachDocumentStream } from '../api/client';
 import Sidebar from '../components/Sidebar';
 import ChatWindow from '../components/ChatWindow';
 import ModelSelector from '../components/ModelSelector';
@@ -14,25 +14,55 @@ export default function Chat() {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const [selectedModel, setSelectedModel] = useState('gpt-4o');
-    const [imageBase64, setImageBase64] = useState(null);
+    const [imageFile, setImageFile] = useState(null);
     const [imagePreview, setImagePreview] = useState(null);
     const [isTyping, setIsTyping] = useState(false);
     const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
-    const [attachedDoc, setAttachedDoc] = useState(null);
+    const [sessionsCursor, setSessionsCursor] = useState(null);
+    const [messagesCursor, setMessagesCursor] = useState(null);
+    const [documents, setDocuments] = useState([]);
+    const [docProgress, setDocProgress] = useState(null);
 
+    // Auto-create a session if none is active; returns its id (null on failure)
+    const ensureSession = async () => {
+        if (activeSessionId) return activeSessionId;
+        try {
+            const res = await createSession('New Chat');
+            setSessions((prev) => [res.data, ...prev]);
+            setActiveSessionId(res.data.id);
+            return res.data.id;
+        } catch {
+            return null;
+        }
+    };
+
+    // Documents are attached to the session server-side; relevant excerpts
+    // are added to the model context on each turn
     const handleDocumentUpload = async (e) => {
         const file = e.target.files[0];
         if (!file) return;
+        const sessionId = await ensureSession();
+        if (!sessionId) return;
 
         setIsTyping(true);
+        setDocProgress({ name: file.name, done: 0, total: null });
         try {
-            const res = await uploadDocument(file);
-            setAttachedDoc({ name: file.name, content: res.data.content });
+            await attachDocumentStream(sessionId, file, (event, data) => {
+                if (event === 'progress') {
+                    setDocProgress({ name: file.name, done: data.pages_done, total: data.pages_total });
+                } else if (event === 'document') {
+                    setDocuments((prev) => [...prev, data]);
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            });
         } catch (err) {
             console.error('Failed to upload document', err);
             alert('Failed to process document. Please try again.');
         } finally {
             setIsTyping(false);
+            setDocProgress(null);
+            e.target.value = '';
         }
     };
 
@@ -41,12 +71,15 @@ export default function Chat() {
         loadSessions();
     }, []);
 
-    // Load messages when session changes
+    // Load messages and documents when session changes
     useEffect(() => {
         if (activeSessionId) {
             loadMessages(activeSessionId);
+            loadDocuments(activeSessionId);
         } else {
             setMessages([]);
+            setMessagesCursor(null);
+            setDocuments([]);
         }
     }, [activeSessionId]);
 
@@ -54,15 +87,56 @@ export default function Chat() {
         try {
             const res = await getSessions();
             setSessions(res.data);
+            setSessionsCursor(res.headers['x-before-cursor'] || null);
+        } catch (err) {
+            console.error('Failed to load sessions', err);
+        }
+    };
+
+    const loadMoreSessions = async () => {
+        try {
+            const res = await getSessions({ before: sessionsCursor });
+            setSessions((prev) => [...prev, ...res.data]);
+            setSessionsCursor(res.headers['x-before-cursor'] || null);
         } catch (err) {
             console.error('Failed to load sessions', err);
         }
     };
 
+    const loadDocuments = async (sessionId) => {
+        try {
+            const res = await getDocuments(sessionId);
+            setDocuments(res.data);
+        } catch (err) {
+            console.error('Failed to load documents', err);
+        }
+    };
+
+    const handleRemoveDocument = async (documentId) => {
+        try {
+            await deleteDocument(activeSessionId, documentId);
+            setDocuments((prev) => prev.filter((d) => d.id !== documentId));
+        } catch (err) {
+            console.error('Failed to remove document', err);
+        }
+    };
+
+    // Loads the latest page; older pages are prepended by loadEarlierMessages
     const loadMessages = async (sessionId) => {
         try {
             const res = await getMessages(sessionId);
             setMessages(res.data);
+            setMessagesCursor(res.headers['x-before-cursor'] || null);
+        } catch (err) {
+            console.error('Failed to load messages', err);
+        }
+    };
+
+    const loadEarlierMessages = async () => {
+        try {
+            const res = await getMessages(activeSessionId, { before: messagesCursor });
+            setMessages((prev) => [...res.data, ...prev]);
+            setMessagesCursor(res.headers['x-before-cursor'] || null);
         } catch (err) {
             console.error('Failed to load messages', err);
         }
@@ -93,31 +167,16 @@ export default function Chat() {
 
     const handleSendMessage = async (e) => {
         e?.preventDefault();
-        if (!input.trim() && !imageBase64 && !attachedDoc) return;
-
-        // Auto-create session if none active
-        let sessionId = activeSessionId;
-        if (!sessionId) {
-            try {
-                const res = await createSession('New Chat');
-                sessionId = res.data.id;
-                setSessions((prev) => [res.data, ...prev]);
-                setActiveSessionId(sessionId);
-            } catch {
-                return;
-            }
-        }
+        if (!input.trim() && !imageFile) return;
 
-        let finalContent = input.trim();
-        if (attachedDoc) {
-            finalContent = `[User uploaded document: ${attachedDoc.name}]\n\nDocument Content:\n${attachedDoc.content}\n\n---\n\nUser Question: ${finalContent || "Please summarize or review this document."}`;
-            setAttachedDoc(null);
-        }
+        const sessionId = await ensureSession();
+        if (!sessionId) return;
 
-        const userContent = finalContent;
+        const userContent = input.trim();
         setInput('');
-        const sentImage = imageBase64;
-        setImageBase64(null);
+        const sentImage = imageFile;
+        const sentPreview = imagePreview;
+        setImageFile(null);
         setImagePreview(null);
         setIsTyping(true);
 
@@ -127,17 +186,36 @@ export default function Chat() {
             session_id: sessionId,
             role: 'user',
             content: userContent,
-            image_url: sentImage ? '[image]' : null,
+            image_url: sentPreview,
             created_at: new Date().toISOString(),
         };
         setMessages((prev) => [...prev, tempUserMsg]);
 
+        const tempAssistantId = 'temp-assistant-' + Date.now();
         try {
-            const res = await apiSendMessage(sessionId, userContent, selectedModel, sentImage);
-            // Replace temp msg and add assistant msg
-            setMessages((prev) => {
-                const filtered = prev.filter((m) => m.id !== tempUserMsg.id);
-                return [...filtered, res.data.user_message, res.data.assistant_message];
+            const imageId = sentImage ? (await uploadImage(sentImage)).data.id : null;
+            await streamMessage(sessionId, userContent, selectedModel, imageId, (event, data) => {
+                if (event === 'user_message') {
+                    // Replace temp msg and open an empty assistant bubble to stream into
+                    setMessages((prev) => [
+                        ...prev.filter((m) => m.id !== tempUserMsg.id),
+                        data,
+                        {
+                            id: tempAssistantId,
+                            session_id: sessionId,
+                            role: 'assistant',
+                            content: '',
+                            created_at: new Date().toISOString(),
+                        },
+                    ]);
+                } else if (event === 'delta') {
+                    setIsTyping(false);
+                    setMessages((prev) => prev.map((m) =>
+                        m.id === tempAssistantId ? { ...m, content: m.content + data.content } : m
+                    ));
+                } else if (event === 'assistant_message') {
+                    setMessages((prev) => prev.map((m) => (m.id === tempAssistantId ? data : m)));
+                }
             });
             // Refresh sessions to update title
             loadSessions();
@@ -146,10 +224,15 @@ export default function Chat() {
                 id: 'error-' + Date.now(),
                 session_id: sessionId,
                 role: 'assistant',
-                content: 'Sorry, something went wrong. Please try again.',
+                content: err.status === 429
+                    ? `You're sending messages too quickly. Please wait ${err.retryAfter || 'a few'} seconds and try again.`
+                    : 'Sorry, something went wrong. Please try again.',
                 created_at: new Date().toISOString(),
             };
-            setMessages((prev) => [...prev, errorMsg]);
+            setMessages((prev) => [
+                ...prev.filter((m) => !(m.id === tempAssistantId && !m.content)),
+                errorMsg,
+            ]);
         } finally {
             setIsTyping(false);
         }
@@ -187,6 +270,7 @@ export default function Chat() {
                 onSelect={setActiveSessionId}
                 onCreate={handleCreateSession}
                 onDelete={handleDeleteSession}
+                onLoadMore={sessionsCursor ? loadMoreSessions : null}
                 collapsed={sidebarCollapsed}
             />
 
@@ -214,6 +298,7 @@ export default function Chat() {
                     isTyping={isTyping}
                     starterPrompts={STARTER_PROMPTS}
                     onSelectPrompt={handleSelectPrompt}
+                    onLoadEarlier={messagesCursor ? loadEarlierMessages : null}
                 />
 
                 {/* Input Area */}
@@ -225,46 +310,55 @@ export default function Chat() {
                                 <ImageUpload
                                     imagePreview={imagePreview}
                                     onImageSelect={() => { }}
-                                    onClear={() => { setImageBase64(null); setImagePreview(null); }}
+                                    onClear={() => { setImageFile(null); setImagePreview(null); }}
                                 />
                             </div>
                         )}
 
-                        {/* Document Attachment Badge */}
-                        {attachedDoc && (
-                            <div className="mb-3 flex items-center gap-2 p-2 bg-accent-500/10 border border-accent-500/20 rounded-lg animate-fade-in">
+                        {/* Document Extraction Progress */}
+                        {docProgress && (
+                            <div className="mb-3 flex items-center gap-2 p-2 bg-dark-800 border border-dark-500 rounded-lg animate-fade-in">
+                                <FileText size={16} className="text-dark-400" />
+                                <span className="text-xs text-dark-300 truncate flex-1">
+                                    Reading {docProgress.name}
+                                    {docProgress.total ? ` — page ${docProgress.done} of ${docProgress.total}` : '…'}
+                                </span>
+                            </div>
+                        )}
+
+                        {/* Documents attached to this session */}
+                        {documents.map((doc) => (
+                            <div key={doc.id} className="mb-3 flex items-center gap-2 p-2 bg-accent-500/10 border border-accent-500/20 rounded-lg animate-fade-in">
                                 <FileText size={16} className="text-accent-400" />
-                                <span className="text-xs text-dark-100 truncate flex-1">{attachedDoc.name}</span>
+                                <span className="text-xs text-dark-100 truncate flex-1">{doc.filename}</span>
                                 <button
-                                    onClick={() => setAttachedDoc(null)}
+                                    onClick={() => handleRemoveDocument(doc.id)}
                                     className="p-1 hover:bg-dark-700 rounded text-dark-400 hover:text-dark-100 leading-none"
                                 >
                                     &times;
                                 </button>
                             </div>
-                        )}
+                        ))}
 
                         <form onSubmit={handleSendMessage} className="flex items-end gap-3">
                             <div className="flex gap-1">
                                 {!imagePreview && (
                                     <ImageUpload
                                         imagePreview={null}
-                                        onImageSelect={(base64, preview) => { setImageBase64(base64); setImagePreview(preview); }}
-                                        onClear={() => { setImageBase64(null); setImagePreview(null); }}
+                                        onImageSelect={(file, preview) => { setImageFile(file); setImagePreview(preview); }}
+                                        onClear={() => { setImageFile(null); setImagePreview(null); }}
                                     />
                                 )}
 
-                                {!attachedDoc && (
-                                    <label className="p-2.5 text-dark-400 hover:text-dark-100 hover:bg-dark-700 rounded-xl transition-all duration-200 cursor-pointer">
-                                        <Paperclip size={20} />
-                                        <input
-                                            type="file"
-                                            className="hidden"
-                                            accept=".pdf,.docx,.txt"
-                                            onChange={handleDocumentUpload}
-                                        />
-                                    </label>
-                                )}
+                                <label className="p-2.5 text-dark-400 hover:text-dark-100 hover:bg-dark-700 rounded-xl transition-all duration-200 cursor-pointer">
+                                    <Paperclip size={20} />
+                                    <input
+                                        type="file"
+                                        className="hidden"
+                                        accept=".pdf,.docx,.txt"
+                                        onChange={handleDocumentUpload}
+                                    />
+                                </label>
                             </div>
 
                             <div className="flex-1 relative">
@@ -285,7 +379,7 @@ export default function Chat() {
 
                             <button
                                 type="submit"
-                                disabled={(!input.trim() && !imageBase64) || isTyping}
+                                disabled={(!input.trim() && !imageFile) || isTyping}
                                 className="p-3 bg-accent-600 text-white rounded-xl hover:bg-accent-500 transition-all duration-300 disabled:opacity-30 disabled:cursor-not-allowed shadow-lg shadow-accent-500/15"
                             >
                                 <Send size={18} />